@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
-from fastapi import FastAPI
-from contextlib import asynccontextmanager
-import uvicorn
-import json
+# 冷启动计时从这里开始，各导入/初始化步骤的耗时见 /ready
+from src.utils.startup import startup
+with startup.step("import fastapi"):
+    from fastapi import FastAPI, Response, Header, HTTPException
+    from fastapi.responses import PlainTextResponse
+    from contextlib import asynccontextmanager
+    import uvicorn
 import os
 import asyncio
+import hmac
 import threading
 from dotenv import load_dotenv
 
@@ -15,164 +19,270 @@ load_dotenv(dotenv_path=".env.example", override=True)
 APP_ID_DEBUG = os.getenv("FEISHU_APP_ID", "")
 print(f"DEBUG: Loaded FEISHU_APP_ID from env: {APP_ID_DEBUG[:10]}***")
 
-import lark_oapi as lark
-from src.larkClient import LarkClient
-from src.agent.rss import get_rss_updates
-from src.agent.summarizer import fetch_and_summarize
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from src.utils.lrucache import LRUCache
-
-# 初始化 LRU Cache，容量为 1000
-event_id_cache = LRUCache(1000)
+# lark_oapi (导入约 3-4 秒)、langgraph 和 LLM 客户端都在 warm_up 中于后台加载，
+# 这里只导入 RSS / 存储等轻量模块，保证 /health 尽快可用
+with startup.step("import rss + pipeline"):
+    from src.agent.rss import get_rss_updates, RSS_URLS
+    from src.agent.feedscheduler import FeedScheduler
+    from src.agent.pipeline import summarize_and_deliver
+with startup.step("import apscheduler"):
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from datetime import datetime, timedelta
+with startup.step("import utils"):
+    from src.utils.lrucache import LRUCache
+    from src.utils.dedupe import SqliteDedupeStore
+    from src.utils.subscriptions import SubscriptionRegistry
+    from src.utils.config import load_config
+    from src.utils.digest import build_digest_cards
+    from src.utils.jobrunner import SingleFlightRunner
+    from src.utils.chatstore import ChatHistoryStore
+    from src.utils.chatlog import ChatLogWriter
+    from src.utils.segmentlog import SegmentedLog, DAY_MS
+    from src.utils.metrics import HISTORY_READ_SECONDS, SCHEDULER_JOB_OVERRUNS, timed_job
+    from src.utils.profiler import sample_stacks, format_collapsed, ProfilerBusy
+    from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+# event_id 去重。超过 60 秒的消息本来就会被丢弃，所以只需保留 TTL 窗口内的记录
+# DEDUPE_BACKEND=lru: 进程内 LRU Cache (journal 持久化)，只适合单进程
+# DEDUPE_BACKEND=sqlite: 多 worker / 多副本共享的 SQLite 去重表 (需共享 cache 目录)
+# 加载 (回放 journal) 放在 warm_up 里，只有收消息时才需要
+DEDUPE_BACKEND = os.getenv("DEDUPE_BACKEND", "lru")
+EVENT_CACHE_CAPACITY = int(os.getenv("EVENT_CACHE_CAPACITY", "100000"))
+EVENT_CACHE_TTL = float(os.getenv("EVENT_CACHE_TTL", "600")) or None
+event_id_cache = None
+
+def init_event_cache():
+    global event_id_cache
+    with startup.step(f"load event dedupe cache ({DEDUPE_BACKEND})"):
+        if DEDUPE_BACKEND == "sqlite":
+            event_id_cache = SqliteDedupeStore(
+                os.getenv("DEDUPE_DB", "cache/event_dedupe.db"),
+                ttl=EVENT_CACHE_TTL,
+                capacity=EVENT_CACHE_CAPACITY,
+            )
+        else:
+            event_id_cache = LRUCache(EVENT_CACHE_CAPACITY, ttl=EVENT_CACHE_TTL)
+    return event_id_cache
+
+def sync_event_cache():
+    if event_id_cache is not None:
+        event_id_cache.sync()
+
+# config.yaml 中的 cronjob.rss_fetch：schedule 是检查到期 feed 的节拍，
+# 每个 feed 实际的抓取间隔由 FeedScheduler 按更新频率自适应
+config = load_config()
+RSS_FETCH_CONFIG = (config.get("cronjob") or {}).get("rss_fetch") or {}
+feed_scheduler = FeedScheduler(RSS_URLS, RSS_FETCH_CONFIG)
+
+# RSS 推送方式：digest 每轮每个群一张卡片 (按大小自动分页)，single 每篇文章一条文本消息
+RSS_PUSH_MODE = os.getenv("RSS_PUSH_MODE", "digest")
 
 SUBSCRIPTIONS_FILE = "./storage/subscriptions.json"
+subscription_registry = SubscriptionRegistry(SUBSCRIPTIONS_FILE)
 CHAT_LOG_FILE = "logs/chat_history.jsonl"
-_chat_log_lock = threading.Lock()
+CHAT_DB_FILE = "logs/chat_history.db"
+
+# 聊天日志按天分段 (logs/chat_history.YYYY-MM-DD.jsonl)，冷分段 gzip。
+# 保留期默认 0 即永久保留 (审计用)；设置天数后才会删除过期分段和索引记录
+CHAT_LOG_COMPRESS_AFTER_DAYS = int(os.getenv("CHAT_LOG_COMPRESS_AFTER_DAYS", "2"))
+CHAT_LOG_RETENTION_DAYS = int(os.getenv("CHAT_LOG_RETENTION_DAYS", "0")) or None
+# SQLite 索引只服务于最近的聊天记录查询 (get_chat_history)，单独设置较短的保留期，
+# 避免它变成一份永久的未压缩副本；审计以分段日志为准
+CHAT_INDEX_RETENTION_DAYS = float(os.getenv("CHAT_INDEX_RETENTION_DAYS", "7"))
+chat_log = SegmentedLog(CHAT_LOG_FILE, CHAT_LOG_COMPRESS_AFTER_DAYS, CHAT_LOG_RETENTION_DAYS)
+
+# 聊天记录索引 (chat_id, timestamp_ms)，分段日志仅保留作审计
+with startup.step("open chat store"):
+    chat_store = ChatHistoryStore(CHAT_DB_FILE)
+    if chat_store.is_empty() and os.path.exists(CHAT_LOG_FILE):
+        imported = chat_store.import_jsonl(CHAT_LOG_FILE)
+        print(f"Imported {imported} chat log entries into {CHAT_DB_FILE}")
+    # 旧的单文件日志拆进按天分段
+    if os.path.exists(CHAT_LOG_FILE):
+        migrated = chat_log.split_legacy()
+        print(f"Split {migrated} legacy chat log entries into daily segments")
+
+# 后台批量写日志，消息处理线程只负责入队
+chat_log_writer = ChatLogWriter(
+    chat_log,
+    store=chat_store,
+    flush_interval=float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", "0.2")),
+    max_queue=int(os.getenv("CHAT_LOG_QUEUE_SIZE", "10000")),
+    fsync_policy=os.getenv("CHAT_LOG_FSYNC", "interval"),
+)
+
+# 管理接口 (/admin/*) 的访问令牌，未设置时这些接口不可用
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # --- 飞书配置 ---
 APP_ID = os.getenv("FEISHU_APP_ID")
 APP_SECRET = os.getenv("FEISHU_APP_SECRET")
 BOT_NAME = os.getenv("BOT_NAME")
+# 预热时等待 WebSocket 建立连接的秒数，超时或连接失败时 /ready 保持 503
+LARK_WS_CONNECT_TIMEOUT = float(os.getenv("LARK_WS_CONNECT_TIMEOUT", "20"))
 
 print(f"starting...{BOT_NAME}")
 
 if not APP_ID or not APP_SECRET:
     raise ValueError("FEISHU_APP_ID or FEISHU_APP_SECRET not set in .env")
 
-# --- 初始化 Lark Client ---
-# 传入 event_id_cache 供客户端去重使用
-lark_client_instance = LarkClient(APP_ID, APP_SECRET, event_id_cache)
-client = lark_client_instance.api_client
+# --- Lark Client ---
+# 在 warm_up 中创建 (见 init_lark_client)，就绪之前为 None
+lark_client_instance = None
 
 def get_subscribed_chats():
-    if not os.path.exists(SUBSCRIPTIONS_FILE):
-        return []
-    with open(SUBSCRIPTIONS_FILE, "r") as f:
-        return json.load(f)
+    # 内存快照，不读磁盘
+    return subscription_registry.chats()
 
 def add_subscription(chat_id):
-    subs = get_subscribed_chats()
-    if chat_id not in subs:
-        subs.append(chat_id)
-        with open(SUBSCRIPTIONS_FILE, "w") as f:
-            json.dump(subs, f)
-        return True
-    return False
+    return subscription_registry.add(chat_id)
 
 import time
 
 def append_chat_log(entry: dict):
     """Persist chat transcripts locally for audit and delayed reactions."""
     try:
-        log_dir = os.path.dirname(CHAT_LOG_FILE)
-        if log_dir:
-            os.makedirs(log_dir, exist_ok=True)
-        log_line = json.dumps(entry, ensure_ascii=False)
-        with _chat_log_lock:
-            with open(CHAT_LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(log_line + "\n")
+        chat_log_writer.append(entry)
     except Exception as e:
         print(f"Failed to write chat log: {e}")
 
 def get_chat_history(chat_id, days=1):
     """Retrieve chat history for the specified chat_id from the last N days."""
+    current_time_ms = int(time.time() * 1000)
+    cutoff_time_ms = current_time_ms - (days * 24 * 60 * 60 * 1000)
     try:
-        if not os.path.exists(CHAT_LOG_FILE):
-            return []
-            
-        current_time_ms = int(time.time() * 1000)
-        cutoff_time_ms = current_time_ms - (days * 24 * 60 * 60 * 1000)
-        
-        history = []
-        with _chat_log_lock:
-            with open(CHAT_LOG_FILE, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        entry = json.loads(line)
-                        entry_time = entry.get("timestamp_ms", 0)
-                        
-                        if entry.get("chat_id") == chat_id and entry_time >= cutoff_time_ms:
-                            history.append(entry)
-                    except json.JSONDecodeError:
-                        continue
-        # Ensure chronological order
-        history.sort(key=lambda x: x.get("timestamp_ms", 0))
-        return history
+        # 走 (chat_id, timestamp_ms) 索引，已按时间排序
+        with HISTORY_READ_SECONDS.time():
+            return chat_store.query(chat_id, cutoff_time_ms)
     except Exception as e:
         print(f"Error reading chat history: {e}")
+    try:
+        # 索引不可用时退回分段日志，只会打开与时间窗重叠的几天
+        return chat_log.read(cutoff_time_ms, chat_id=chat_id)
+    except Exception as e:
+        print(f"Error reading chat log segments: {e}")
         return []
 
-# 注册回调和 History Provider
-lark_client_instance.set_chat_log_callback(append_chat_log)
-lark_client_instance.set_history_provider(get_chat_history)
-
-def check_rss_and_push():
-    print("Checking RSS updates...")
+def maintain_chat_log():
+    """压缩冷分段、删除过期分段，并清掉索引里超过索引保留期的记录"""
+    stats = chat_log_writer.maintain()
+    # 至少保留 get_chat_history 默认查询的 1 天
+    index_days = max(CHAT_INDEX_RETENTION_DAYS, 1)
+    if CHAT_LOG_RETENTION_DAYS:
+        index_days = min(index_days, CHAT_LOG_RETENTION_DAYS)
+    stats["pruned_rows"] = chat_store.prune(int(time.time() * 1000 - index_days * DAY_MS))
+    if any(stats.values()):
+        print(f"Chat log maintenance: {stats}")
+    return stats
+
+def run_push_cycle(news_label, summary_label, urls=None):
+    """
+    拉取 RSS 更新 (urls 为空时拉取全部 feed)，并经由 抓取 → 摘要 → 投递 流水线推送给所有订阅者。
+    返回推送的文章数，拉取失败时返回 None。
+    """
+    # 流水线的截止时间从这里算起，拉取 RSS 的耗时也计入 PIPELINE_DEADLINE
+    cycle_started = time.monotonic()
     try:
-        updates = get_rss_updates()
+        updates = get_rss_updates(urls, on_feed=feed_scheduler.record)
     except Exception as e:
         print(f"Error fetching RSS: {e}")
-        return
+        return None
+    finally:
+        feed_scheduler.save()
 
     if not updates:
         print("No new updates.")
-        return
+        return 0
 
     subs = get_subscribed_chats()
     print(f"Subscribers: {subs}")
     if not subs:
         print("No subscribers.")
-        return
-    
-    for entry in updates:
-        print(f"Generating summary for: {entry['title']}")
-        summary = fetch_and_summarize(entry['link'])
-        message_text = f"【GameDev News】\n{entry['title']}\n{entry['link']}\n\n【女仆摘要】\n{summary}"
-        for chat_id in subs:
-            print(f"Pushing to {chat_id}: {entry['title']}")
-            resp = lark_client_instance.send_text_message(chat_id, message_text)
-            if not resp.success():
-                print(f"Failed to push to {chat_id}: {resp.code}, {resp.msg}")
+        return 0
+
+    def report_failures(results):
+        for r in results:
+            if not r["success"]:
+                print(f"Failed to push to {r['receive_id']}: {r['code']}, {r['msg']} (attempts: {r['attempts']})")
+
+    if RSS_PUSH_MODE == "digest":
+        # 先收集整轮的摘要，最后每个群只发一张 (或按大小拆成几张) 卡片
+        order = {id(entry): i for i, entry in enumerate(updates)}
+        collected = []
+        collected_lock = threading.Lock()
+
+        def collect(entry, summary):
+            with collected_lock:
+                collected.append((order.get(id(entry), len(order)), entry, summary))
+
+        summarize_and_deliver(updates, collect, cycle_started=cycle_started)
+        with collected_lock:
+            items = [(entry, summary) for _, entry, summary in sorted(collected, key=lambda x: x[0])]
+        if not items:
+            return 0
+        cards = build_digest_cards(items, f"{news_label} · {len(items)} 篇更新", summary_label)
+        print(f"Pushing digest ({len(items)} entries, {len(cards)} card(s)) to {len(subs)} chats")
+        for card in cards:
+            report_failures(lark_client_instance.bulk_send(subs, "interactive", card))
+        return len(items)
+
+    def deliver(entry, summary):
+        message_text = f"【{news_label}】\n{entry['title']}\n{entry['link']}\n\n【{summary_label}】\n{summary}"
+        print(f"Pushing to {len(subs)} chats: {entry['title']}")
+        report_failures(lark_client_instance.send_text_messages(subs, message_text))
+
+    stats = summarize_and_deliver(updates, deliver, cycle_started=cycle_started)
+    return stats["delivered"]
+
+def check_rss_and_push():
+    due = feed_scheduler.due_feeds()
+    if not due:
+        print("No feeds due.")
+        return 0
+    print(f"Checking RSS updates for {len(due)} due feed(s)...")
+    return run_push_cycle("GameDev News", "女仆摘要", urls=due)
 
 async def check_rss_and_push_async():
     """
     Async wrapper for check_rss_and_push with timeout.
     """
+    if lark_client_instance is None:
+        print("Lark client not ready yet, skipping scheduled RSS check.")
+        return
     print("Starting scheduled RSS check (Async)...")
     try:
+        # 与 /push 共用同一个单飞执行器，正在运行时直接并入，不会同时跑两轮
+        run, started = push_runner.submit(check_rss_and_push)
+        if not started:
+            print("RSS cycle already running, joining it.")
         # 设置 300 秒 (5分钟) 的整体超时时间
-        await asyncio.wait_for(asyncio.to_thread(check_rss_and_push), timeout=300)
-    except asyncio.TimeoutError:
-        print("Scheduled RSS check timed out after 300s!")
+        if not await asyncio.to_thread(run.wait, 300):
+            print("Scheduled RSS check timed out after 300s!")
     except Exception as e:
         print(f"Error in scheduled RSS check: {e}")
 
 def check_rss_and_push_sync():
     print("Checking RSS updates (Sync)...")
-    try:
-        updates = get_rss_updates()
-    except Exception as e:
-        print(f"Error fetching RSS: {e}")
-        return
-
-    if not updates:
-        print("No new updates.")
-        return
-
-    subs = get_subscribed_chats()
-    if not subs:
-        print("No subscribers.")
-        return
+    return run_push_cycle("Neko 新闻", "AI 摘要")
+
+def notify_push_requesters(run):
+    """后台 RSS 推送结束后，通知触发过 /push 的群"""
+    if run.error is not None or run.result is None:
+        text = "RSS 推送失败，请稍后再试。"
+    elif run.result == 0:
+        text = f"RSS 检查完成，暂无新文章。(耗时 {run.seconds:.0f} 秒)"
+    else:
+        text = f"RSS 推送完成，共 {run.result} 篇新文章。(耗时 {run.seconds:.0f} 秒)"
+    for chat_id in run.requesters:
+        try:
+            lark_client_instance.send_text_message(chat_id, text)
+        except Exception as e:
+            print(f"Failed to notify {chat_id}: {e}")
 
-    for entry in updates:
-        print(f"Generating summary for: {entry['title']}")
-        summary = fetch_and_summarize(entry['link'])
-        message_text = f"【Neko 新闻】\n{entry['title']}\n{entry['link']}\n\n【AI 摘要】\n{summary}"
-        for chat_id in subs:
-            print(f"Pushing to {chat_id}: {entry['title']}")
-            resp = lark_client_instance.send_text_message(chat_id, message_text)
-            if not resp.success():
-                print(f"Failed to push to {chat_id}: {resp.code}, {resp.msg}")
+# 同一时间只跑一轮 RSS 推送；/push 与定时任务都经由它触发
+push_runner = SingleFlightRunner("rss_push", on_done=notify_push_requesters)
 
 
 # --- 定义依赖主逻辑的指令 ---
@@ -183,14 +293,101 @@ def cmd_subscribe(chat_id, text):
         return "您已订阅，无需重复操作。"
 
 def cmd_push_now(chat_id, text):
-    # check_rss_and_push_sync 是 main 中的函数
-    check_rss_and_push_sync()
-    print("Manual RSS check and push triggered.")
-    return "已手动触发 RSS 检查与推送。"
+    # 在后台执行，立即回复；已有一轮在跑时并入它，完成后统一通知
+    run, started = push_runner.submit(check_rss_and_push_sync, requester=chat_id)
+    if started:
+        print("Manual RSS check and push triggered.")
+        return "已开始 RSS 检查与推送，完成后会在本群通知。"
+    return f"已有一轮 RSS 推送正在进行 (已运行 {run.seconds:.0f} 秒)，完成后会在本群通知。"
+
+
+def init_lark_client():
+    """导入 lark_oapi / langgraph 并创建 LarkClient，注册回调和指令"""
+    global lark_client_instance
+    with startup.step("import larkClient (lark_oapi, langgraph)"):
+        from src.larkClient import LarkClient
+    with startup.step("init LarkClient"):
+        # 传入 event_id_cache 供客户端去重使用
+        instance = LarkClient(APP_ID, APP_SECRET, event_id_cache or init_event_cache())
+        # 注册回调和 History Provider
+        instance.set_chat_log_callback(append_chat_log)
+        instance.set_history_provider(get_chat_history)
+        # --- 注册外部指令到 LarkClient ---
+        instance.register_command("/subscribe", cmd_subscribe, "订阅 Unreal Engine 新闻推送")
+        instance.register_command("/push", cmd_push_now, "立刻执行一次 RSS 推送")
+    lark_client_instance = instance
+    return instance
+
+def warm_up():
+    """
+    后台预热：去重缓存 → LarkClient → WebSocket → 图 / LLM / HTTP 连接池。
+    全部成功后标记就绪 (/ready 返回 200)，并打印启动耗时报告。
+    """
+    pid = os.getpid()
+    startup.expect("event_cache", "lark_client", "lark_ws", "graph", "llm", "http_session")
+
+    def component(name, fn):
+        try:
+            fn()
+            startup.set_component(name, True)
+        except Exception as e:
+            startup.set_component(name, False, str(e))
+            print(f"[PID:{pid}] Warm-up failed for {name}: {e}")
+
+    component("event_cache", init_event_cache)
+    component("lark_client", init_lark_client)
+    if lark_client_instance is None:
+        print(startup.format())
+        return
 
-# --- 注册外部指令到 LarkClient ---
-lark_client_instance.register_command("/subscribe", cmd_subscribe, "订阅 Unreal Engine 新闻推送")
-lark_client_instance.register_command("/push", cmd_push_now, "立刻执行一次 RSS 推送")
+    def start_ws():
+        import lark_oapi as lark
+        # cli.start() 在线程里阻塞运行，连接结果只能从线程里拿到：
+        # 连上后或 start() 抛错时设置 settled，预热线程据此判断组件状态。
+        # 首次连接超时后 SDK 会自动重连，之后每次连上都重新上报 lark_ws，/ready 可以恢复
+        settled = threading.Event()
+        failure = {}
+
+        class ReadyWsClient(lark.ws.Client):
+            async def _connect(self):
+                await super()._connect()
+                if self._conn is not None:
+                    settled.set()
+                    startup.set_component("lark_ws", True)
+                    startup.mark_ready_if_ok()
+
+        def run():
+            try:
+                cli.start()
+            except Exception as e:
+                failure["error"] = e
+                settled.set()
+
+        # Start Lark WebSocket Client
+        print(f"[PID:{pid}] Starting Lark WebSocket Client...")
+        # 使用 lark_client_instance.event_handler
+        cli = ReadyWsClient(APP_ID, APP_SECRET,
+                            event_handler=lark_client_instance.event_handler,
+                            log_level=lark.LogLevel.DEBUG)
+        ws_thread = threading.Thread(target=run, name="lark-ws")
+        ws_thread.daemon = True
+        ws_thread.start()
+        if not settled.wait(LARK_WS_CONNECT_TIMEOUT):
+            raise TimeoutError(f"websocket not connected after {LARK_WS_CONNECT_TIMEOUT}s")
+        if "error" in failure:
+            raise RuntimeError(f"websocket connect failed: {failure['error']}")
+
+    with startup.step("start lark websocket"):
+        component("lark_ws", start_ws)
+
+    from src.agent import index as agent
+    from src.agent.clients import get_http_session
+    component("graph", agent.get_graph)
+    component("llm", agent.get_chat_llm)
+    component("http_session", get_http_session)
+
+    if not startup.mark_ready_if_ok():
+        print(startup.format())
 
 
 @asynccontextmanager
@@ -198,28 +395,43 @@ async def lifespan(app: FastAPI):
     pid = os.getpid()
     print(f"[PID:{pid}] Starting application lifespan...")
     
+    chat_log_writer.start()
+
     scheduler = AsyncIOScheduler()
-    # 每半小时执行一次 RSS 检查
-    scheduler.add_job(check_rss_and_push_async, 'cron', minute='*/30', max_instances=3)
-    # 每一分钟执行一次 Cache Sync
-    scheduler.add_job(event_id_cache.sync, 'cron', minute='*')
+    # 按 config.yaml 的节拍检查到期的 feed
+    if RSS_FETCH_CONFIG.get("enabled", True):
+        trigger = CronTrigger.from_crontab(RSS_FETCH_CONFIG.get("schedule", "*/5 * * * *"))
+        first = trigger.get_next_fire_time(None, datetime.now(trigger.timezone))
+        tick_seconds = (trigger.get_next_fire_time(first, first + timedelta(seconds=1)) - first).total_seconds()
+        scheduler.add_job(timed_job("rss_push", interval_seconds=tick_seconds)(check_rss_and_push_async), trigger,
+                          max_instances=3, id="rss_push")
+    else:
+        print(f"[PID:{pid}] RSS fetch disabled in config.")
+    # 每小时整理一次聊天日志分段
+    scheduler.add_job(timed_job("chat_log_maintenance")(maintain_chat_log), 'cron', minute=5,
+                      id="chat_log_maintenance")
+    # 每一分钟把去重 journal 刷盘
+    scheduler.add_job(timed_job("cache_sync", interval_seconds=60)(sync_event_cache), 'cron', minute='*',
+                      id="cache_sync")
+
+    def on_job_skipped(event):
+        reason = "max_instances" if event.code == EVENT_JOB_MAX_INSTANCES else "missed"
+        SCHEDULER_JOB_OVERRUNS.labels(event.job_id, reason).inc()
+    scheduler.add_listener(on_job_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
     
     print(f"[PID:{pid}] Scheduler started. Jobs scheduled.")
     scheduler.start()
 
-    # Start Lark WebSocket Client
-    print(f"[PID:{pid}] Starting Lark WebSocket Client...")
-    # 使用 lark_client_instance.event_handler
-    cli = lark.ws.Client(APP_ID, APP_SECRET,
-                         event_handler=lark_client_instance.event_handler,
-                         log_level=lark.LogLevel.DEBUG)
-    
-    ws_thread = threading.Thread(target=cli.start)
-    ws_thread.daemon = True
-    ws_thread.start()
+    # 重量级的初始化放到后台，/health 不必等待
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
     yield
     print(f"[PID:{pid}] Application shutdown.")
+    scheduler.shutdown(wait=False)
+    if lark_client_instance is not None:
+        lark_client_instance.shutdown()
+    # 把还在队列中的聊天日志写完再退出
+    chat_log_writer.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -231,6 +443,34 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def ready(response: Response):
+    """预热完成 (LarkClient、WebSocket、图、LLM) 后返回 200，否则 503；附带启动耗时报告"""
+    report = startup.as_dict()
+    if not report["ready"]:
+        response.status_code = 503
+    return report
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/admin/profile")
+async def admin_profile(seconds: float = 10, interval: float = 0.01, idle: bool = False,
+                        x_admin_token: str = Header(default="")):
+    """
+    采样所有线程 seconds 秒，返回折叠栈 (可直接生成火焰图)。
+    需要请求头 X-Admin-Token 与 ADMIN_TOKEN 一致；idle=true 时包含空闲等待中的线程。
+    """
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=404)
+    try:
+        # 采样循环放在独立线程，不阻塞事件循环
+        stacks, rounds = await asyncio.to_thread(sample_stacks, seconds, interval, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(format_collapsed(stacks), headers={"X-Profile-Samples": str(rounds)})
+
 def main():
     # 启动 FastAPI
     uvicorn.run(app, host="0.0.0.0", port=8000)
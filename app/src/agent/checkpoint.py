@@ -0,0 +1,297 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+
+def trim_message_window(messages, max_messages: int, max_chars: int):
+    """
+    从最新的消息往前保留，直到超过条数或字符数上限；
+    保证窗口从用户消息开始，避免以孤立的 AI 回复开头。
+    """
+    kept = []
+    chars = 0
+    for message in reversed(messages):
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if kept and (len(kept) >= max_messages or chars + len(content) > max_chars):
+            break
+        kept.append(message)
+        chars += len(content)
+    kept.reverse()
+    while len(kept) > 1 and not isinstance(kept[0], HumanMessage):
+        kept.pop(0)
+    return kept
+
+
+class BoundedSqliteSaver(BaseCheckpointSaver):
+    """
+    有界的 SQLite checkpointer：
+      - 每个 thread 只保留最新的一个 checkpoint (不保留历史)
+      - messages 通道写入前裁剪到最近 max_messages 条 / max_chars 个字符
+      - 磁盘上最多保留 max_threads 个 thread，超出时淘汰最久未活跃的
+      - 内存中只缓存最近访问的 cache_threads 个 thread
+    仅实现同步接口 (graph.invoke / graph.stream)。
+    """
+
+    def __init__(self, db_file: str = "cache/checkpoints.db", max_messages: int = 40,
+                 max_chars: int = 8000, max_threads: int = 5000, cache_threads: int = 256,
+                 serde=None):
+        super().__init__(serde=serde)
+        self.db_file = db_file
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.max_threads = max_threads
+        self.cache_threads = cache_threads
+        self._cache = OrderedDict()  # (thread_id, checkpoint_ns) -> CheckpointTuple
+        self._lock = threading.RLock()
+        self._puts_since_prune = 0
+        db_dir = os.path.dirname(self.db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    parent_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (thread_id, checkpoint_ns)
+                );
+                CREATE INDEX IF NOT EXISTS idx_checkpoints_updated ON checkpoints (updated_at);
+                CREATE TABLE IF NOT EXISTS blobs (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, channel)
+                );
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    task_path TEXT,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                );
+                """
+            )
+
+    # --- 内部工具 ---
+    def _cache_get(self, key):
+        tup = self._cache.get(key)
+        if tup is not None:
+            self._cache.move_to_end(key)
+        return tup
+
+    def _cache_put(self, key, tup):
+        self._cache[key] = tup
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_threads:
+            self._cache.popitem(last=False)
+
+    def _load(self, thread_id, checkpoint_ns):
+        row = self._conn.execute(
+            "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ).fetchone()
+        if row is None:
+            return None
+        checkpoint_id, parent_id, ctype, cblob, mtype, mblob = row
+        checkpoint = self.serde.loads_typed((ctype, cblob))
+        versions = checkpoint["channel_versions"]
+        channel_values = {}
+        for channel, version, vtype, value in self._conn.execute(
+            "SELECT channel, version, type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ):
+            if vtype == "empty" or str(versions.get(channel)) != version:
+                continue
+            channel_values[channel] = self.serde.loads_typed((vtype, value))
+        pending_writes = [
+            (task_id, channel, self.serde.loads_typed((wtype, value)))
+            for task_id, channel, wtype, value in self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        ]
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((mtype, mblob)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    def _prune_threads(self):
+        # 调用方已持有锁并处于事务中
+        count = self._conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+        excess = count - self.max_threads
+        if excess <= 0:
+            return
+        stale = [r[0] for r in self._conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id ORDER BY MAX(updated_at) LIMIT ?",
+            (excess,),
+        )]
+        for thread_id in stale:
+            self._delete(thread_id)
+        print(f"Checkpointer evicted {len(stale)} idle threads.")
+
+    def _delete(self, thread_id):
+        for table in ("checkpoints", "blobs", "writes"):
+            self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        for key in [k for k in self._cache if k[0] == thread_id]:
+            del self._cache[key]
+
+    # --- BaseCheckpointSaver 接口 ---
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = (thread_id, checkpoint_ns)
+        with self._lock:
+            tup = self._cache_get(key)
+            if tup is None:
+                tup = self._load(thread_id, checkpoint_ns)
+                if tup is None:
+                    return None
+                self._cache_put(key, tup)
+        checkpoint_id = get_checkpoint_id(config)
+        # 只保留最新的 checkpoint，请求历史版本时视为不存在
+        if checkpoint_id and checkpoint_id != tup.config["configurable"]["checkpoint_id"]:
+            return None
+        return tup
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        sql = "SELECT thread_id, checkpoint_ns FROM checkpoints"
+        params = []
+        if config is not None:
+            sql += " WHERE thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                sql += " AND checkpoint_ns = ?"
+                params.append(config["configurable"]["checkpoint_ns"])
+        sql += " ORDER BY updated_at DESC"
+        with self._lock:
+            keys = self._conn.execute(sql, params).fetchall()
+        before_id = get_checkpoint_id(before) if before else None
+        for thread_id, checkpoint_ns in keys:
+            if limit is not None and limit <= 0:
+                return
+            query = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}}
+            if config is not None and get_checkpoint_id(config):
+                query["configurable"]["checkpoint_id"] = get_checkpoint_id(config)
+            tup = self.get_tuple(query)
+            if tup is None:
+                continue
+            if before_id and tup.config["configurable"]["checkpoint_id"] >= before_id:
+                continue
+            if filter and not all(tup.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield tup
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = checkpoint["id"]
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        blob_rows = []
+        for channel, version in new_versions.items():
+            if channel not in values:
+                blob_rows.append((thread_id, checkpoint_ns, channel, str(version), "empty", None))
+                continue
+            value = values[channel]
+            if channel == "messages" and isinstance(value, list):
+                value = trim_message_window(value, self.max_messages, self.max_chars)
+            vtype, vblob = self.serde.dumps_typed(value)
+            blob_rows.append((thread_id, checkpoint_ns, channel, str(version), vtype, vblob))
+        ctype, cblob = self.serde.dumps_typed(c)
+        mtype, mblob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    blob_rows,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_id, "
+                    "type, checkpoint, metadata_type, metadata, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, config["configurable"].get("checkpoint_id"),
+                     ctype, cblob, mtype, mblob, time.time()),
+                )
+                # 旧 checkpoint 的 pending writes 已经不再需要
+                self._conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= 100:
+                    self._puts_since_prune = 0
+                    self._prune_threads()
+            self._cache.pop((thread_id, checkpoint_ns), None)
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+        }}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            vtype, vblob = self.serde.dumps_typed(value)
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, vtype, vblob,
+                         task_path, write_idx))
+        with self._lock:
+            with self._conn:
+                for row in rows:
+                    # 特殊通道 (idx < 0) 可覆盖，普通写入已存在时保留原值
+                    verb = "INSERT OR REPLACE" if row[-1] < 0 else "INSERT OR IGNORE"
+                    self._conn.execute(
+                        f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                        "type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        row[:-1],
+                    )
+            self._cache.pop((thread_id, checkpoint_ns), None)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            with self._conn:
+                self._delete(thread_id)
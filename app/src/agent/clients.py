@@ -0,0 +1,111 @@
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from src.utils.metrics import OUTBOUND_CONNECTIONS, OUTBOUND_REQUESTS
+
+# --- DeepSeek 配置 ---
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+BASE_URL = "https://api.deepseek.com"
+
+# 进程级连接池配置
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+_lock = threading.Lock()
+_http_session = None
+_llm_http_client = None
+_llms = {}
+
+
+# 连接复用统计：连接池新建连接时计数，导出到 /metrics
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        OUTBOUND_CONNECTIONS.labels("http").inc()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        OUTBOUND_CONNECTIONS.labels("http").inc()
+        return super()._new_conn()
+
+
+class _CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        OUTBOUND_REQUESTS.labels("http").inc()
+        return super().send(request, **kwargs)
+
+
+def get_http_session() -> requests.Session:
+    """抓取网页用的共享 Session，复用 keep-alive 连接"""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = _CountingAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def _trace_llm_request(request):
+    OUTBOUND_REQUESTS.labels("llm").inc()
+
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            OUTBOUND_CONNECTIONS.labels("llm").inc()
+
+    request.extensions["trace"] = trace
+
+
+def get_llm_http_client() -> httpx.Client:
+    """所有 ChatOpenAI 实例共享的 httpx 连接池"""
+    global _llm_http_client
+    with _lock:
+        if _llm_http_client is None:
+            _llm_http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=LLM_POOL_SIZE,
+                    max_keepalive_connections=LLM_POOL_SIZE,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=LLM_TIMEOUT,
+                event_hooks={"request": [_trace_llm_request]},
+            )
+        return _llm_http_client
+
+
+def get_llm(temperature: float = 0.7):
+    """按 temperature 缓存的 DeepSeek 模型 (兼容 OpenAI 接口)，底层共享同一个连接池"""
+    if not DEEPSEEK_API_KEY:
+        raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
+    # langchain_openai 导入较慢 (~1-2s)，推迟到第一次创建模型时
+    from langchain_openai import ChatOpenAI
+    http_client = get_llm_http_client()
+    with _lock:
+        llm = _llms.get(temperature)
+        if llm is None:
+            llm = _llms[temperature] = ChatOpenAI(
+                model="deepseek-chat",
+                openai_api_key=DEEPSEEK_API_KEY,
+                openai_api_base=BASE_URL,
+                temperature=temperature,
+                http_client=http_client,
+            )
+        return llm
+
@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+# 随机插话时附带的聊天记录 token 预算 (含 checkpointer 里已有的对话)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# 预留给滚动摘要的 token 数
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "400"))
+# 单次折叠进摘要的旧消息上限，更早的消息直接丢弃
+SUMMARY_INPUT_TOKENS = int(os.getenv("CONTEXT_SUMMARY_INPUT_TOKENS", "4000"))
+# 内存中缓存摘要的群数量
+SUMMARY_CACHE_CHATS = int(os.getenv("CONTEXT_SUMMARY_CACHE_CHATS", "512"))
+
+# 滚动摘要作为 System Prompt 的一部分传给模型 (见 format_summary)。
+# 旧版本曾把它作为 SystemMessage 放进图的输入，被 checkpointer 存进了会话，用这个前缀识别
+SUMMARY_PREFIX = "以下是本群更早聊天内容的摘要："
+
+_CJK_RE = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算：中日韩字符每字约 1 token，其余约 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4 + 1
+
+
+def _message_text(message) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def format_summary(summary: str) -> str:
+    return f"{SUMMARY_PREFIX}\n{summary}"
+
+
+def is_summary_message(message) -> bool:
+    """checkpointer 里残留的旧摘要消息"""
+    return isinstance(message, SystemMessage) and _message_text(message).startswith(SUMMARY_PREFIX)
+
+
+class ContextBuilder:
+    """
+    按 token 预算组装随机插话时的上下文：
+      1. 去掉 checkpointer 已经带上的消息和当前消息本身
+      2. 从最新往前尽量原样保留
+      3. 放不下的更早消息折叠进按群缓存的滚动摘要
+    摘要不放进消息列表：消息会被 checkpointer 存下来，摘要则每次随 config 传给 chatbot 节点
+    """
+
+    def __init__(self, summarize_fn, budget: int = CONTEXT_TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_TOKEN_BUDGET, summary_input_tokens: int = SUMMARY_INPUT_TOKENS,
+                 cache_chats: int = SUMMARY_CACHE_CHATS):
+        self.summarize_fn = summarize_fn
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.summary_input_tokens = summary_input_tokens
+        self.cache_chats = cache_chats
+        # chat_id -> {"until_ts": 已折叠的最后一条消息时间, "summary": 摘要}
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, chat_id, text, history, checkpointed=()):
+        """返回 (需要放在当前消息之前的 LangChain 消息列表, 滚动摘要或 None)"""
+        checkpointed = [m for m in checkpointed if not is_summary_message(m)]
+        seen = {_normalize(_message_text(m)) for m in checkpointed}
+        seen.add(_normalize(text))
+        entries = [
+            h for h in history
+            if h.get("direction") in ("inbound", "outbound")
+            and h.get("text")
+            and _normalize(h.get("text")) not in seen
+        ]
+
+        remaining = self.budget - estimate_tokens(text) - sum(estimate_tokens(_message_text(m)) for m in checkpointed)
+        if remaining <= 0 or not entries:
+            return [], None
+
+        # 从最新往前原样保留；如果放不下全部，预留摘要的空间
+        verbatim_budget = remaining
+        total = sum(estimate_tokens(h["text"]) for h in entries)
+        if total > remaining:
+            verbatim_budget = max(0, remaining - self.summary_budget)
+        verbatim = []
+        used = 0
+        for h in reversed(entries):
+            cost = estimate_tokens(h["text"])
+            if used + cost > verbatim_budget:
+                break
+            verbatim.append(h)
+            used += cost
+        verbatim.reverse()
+        older = entries[:len(entries) - len(verbatim)]
+
+        summary = self._rolling_summary(chat_id, older) if older else None
+        messages = []
+        for h in verbatim:
+            if h["direction"] == "inbound":
+                messages.append(HumanMessage(content=h["text"]))
+            else:
+                messages.append(AIMessage(content=h["text"]))
+        return messages, summary or None
+
+    def _rolling_summary(self, chat_id, older):
+        with self._lock:
+            cached = self._summaries.get(chat_id)
+            if cached is not None:
+                self._summaries.move_to_end(chat_id)
+        until_ts = cached["until_ts"] if cached else 0
+        prev_summary = cached["summary"] if cached else ""
+
+        new_entries = [h for h in older if h.get("timestamp_ms", 0) > until_ts]
+        if not new_entries:
+            return prev_summary
+
+        # 只折叠最近的一段，避免首次摘要时把整天的记录都塞给 LLM
+        fold = []
+        used = 0
+        for h in reversed(new_entries):
+            cost = estimate_tokens(h["text"])
+            if fold and used + cost > self.summary_input_tokens:
+                break
+            fold.append(h)
+            used += cost
+        fold.reverse()
+
+        try:
+            summary = self.summarize_fn(prev_summary, fold)
+        except Exception as e:
+            print(f"Failed to summarize chat history for {chat_id}: {e}")
+            return prev_summary
+        if not summary:
+            return prev_summary
+
+        with self._lock:
+            self._summaries[chat_id] = {"until_ts": new_entries[-1].get("timestamp_ms", 0), "summary": summary}
+            self._summaries.move_to_end(chat_id)
+            while len(self._summaries) > self.cache_chats:
+                self._summaries.popitem(last=False)
+        return summary
+
+
+def summarize_history_with(get_llm):
+    """基于 LLM 的滚动摘要函数：旧摘要 + 新消息 -> 新摘要。get_llm 在首次摘要时才调用"""
+    def summarize(prev_summary, entries):
+        lines = []
+        for h in entries:
+            speaker = "用户" if h.get("direction") == "inbound" else "Vanilla"
+            lines.append(f"{speaker}: {h['text']}")
+        prompt = (
+            "请把下面的群聊记录合并进已有摘要，输出更新后的摘要。"
+            "保留话题、结论和未解决的问题，不超过 200 字。\n\n"
+            f"已有摘要：\n{prev_summary or '（无）'}\n\n新的聊天记录：\n" + "\n".join(lines)
+        )
+        response = get_llm().invoke([HumanMessage(content=prompt)])
+        return response.content.strip()
+    return summarize
@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+from src.utils.fileio import atomic_write_json
+
+SCHEDULE_FILE = os.getenv("RSS_SCHEDULE_FILE", "rss_schedule.json")
+
+# 默认参数 (秒)，可在 config.yaml 的 cronjob.rss_fetch 中覆盖
+DEFAULTS = {
+    "min_interval": 10 * 60,
+    "max_interval": 24 * 3600,
+    "default_interval": 30 * 60,
+    "max_backoff": 24 * 3600,
+    # 按观测到的更新间隔的多少倍轮询
+    "poll_factor": 0.5,
+    # 每次排期加减的随机比例，避免所有 feed 挤在同一个 tick
+    "jitter": 0.1,
+    # 新 feed 首次抓取在这个窗口内随机错开
+    "initial_spread": 10 * 60,
+}
+
+
+def _entry_timestamps(feed):
+    stamps = []
+    for entry in feed.entries:
+        parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+        if parsed:
+            stamps.append(time.mktime(parsed))
+    return sorted(stamps, reverse=True)
+
+
+def observed_interval(feed, max_entries: int = 20):
+    """最近若干篇文章之间间隔的中位数，文章少于两篇时返回 None"""
+    stamps = _entry_timestamps(feed)[:max_entries]
+    gaps = [a - b for a, b in zip(stamps, stamps[1:]) if a > b]
+    if not gaps:
+        return None
+    return statistics.median(gaps)
+
+
+def hinted_interval(feed):
+    """发布方给出的最短轮询间隔：RSS <ttl> (分钟) 与 Cache-Control max-age 取大"""
+    hint = 0
+    try:
+        ttl = int(feed.feed.get("ttl") or 0)
+        hint = max(hint, ttl * 60)
+    except (TypeError, ValueError):
+        pass
+    headers = getattr(feed, "headers", None) or {}
+    cache_control = next((v for k, v in headers.items() if k.lower() == "cache-control"), "")
+    for directive in cache_control.split(","):
+        key, _, value = directive.strip().partition("=")
+        if key.lower() == "max-age":
+            try:
+                hint = max(hint, int(value.strip('"')))
+            except ValueError:
+                pass
+    return hint
+
+
+class FeedScheduler:
+    """
+    每个 feed 独立排期：
+      - 成功：间隔 = 观测到的更新间隔 × poll_factor，不低于 ttl / Cache-Control，
+        并限制在 [min_interval, max_interval]
+      - 失败：按 default_interval × 2^连续失败次数 指数退避，最多 max_backoff
+      - 每次排期加随机抖动，把抓取分散到不同的 tick
+    排期状态单独保存在 SCHEDULE_FILE，与 rss_state.json 互不影响。
+    """
+
+    def __init__(self, urls, config=None, state_file: str = SCHEDULE_FILE, rng=None):
+        self.urls = list(urls)
+        self.options = dict(DEFAULTS)
+        for key in DEFAULTS:
+            if config and config.get(key) is not None:
+                self.options[key] = float(config[key])
+        self.state_file = state_file
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._state = self._load()
+        now = time.time()
+        for url in self.urls:
+            if url not in self._state:
+                self._state[url] = {
+                    "interval": self.options["default_interval"],
+                    "errors": 0,
+                    "next_due": now + self._rng.uniform(0, self.options["initial_spread"]),
+                }
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading feed schedule from {self.state_file}: {e}")
+            return {}
+
+    def save(self):
+        with self._lock:
+            snapshot = {url: dict(s) for url, s in self._state.items() if url in self.urls}
+        try:
+            atomic_write_json(self.state_file, snapshot, indent=2)
+        except Exception as e:
+            print(f"Error saving feed schedule to {self.state_file}: {e}")
+
+    def _jittered(self, seconds: float) -> float:
+        jitter = self.options["jitter"]
+        return seconds * self._rng.uniform(1 - jitter, 1 + jitter)
+
+    def due_feeds(self, now: float = None):
+        """
+        返回已到期的 feed，并先把它们的下次时间顺延一个间隔 (相当于领取)，
+        避免上一轮还没跑完时下一个 tick 重复抓取。
+        """
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            for url in self.urls:
+                s = self._state[url]
+                if s["next_due"] <= now:
+                    s["next_due"] = now + self._jittered(s["interval"])
+                    due.append(url)
+        return due
+
+    def record(self, url, feed, now: float = None):
+        """根据一次抓取结果 (feed 为 None 表示失败或超时) 重新计算该 feed 的排期"""
+        now = time.time() if now is None else now
+        opts = self.options
+        failed = feed is None or (getattr(feed, "bozo", False) and not feed.entries)
+        with self._lock:
+            s = self._state.setdefault(url, {"interval": opts["default_interval"], "errors": 0, "next_due": now})
+            if failed:
+                s["errors"] += 1
+                delay = min(opts["max_backoff"], opts["default_interval"] * (2 ** s["errors"]))
+                s["next_due"] = now + self._jittered(delay)
+                print(f"Feed {url} failed {s['errors']} time(s), next try in {delay:.0f}s")
+                return
+            observed = observed_interval(feed)
+            interval = observed * opts["poll_factor"] if observed else opts["default_interval"]
+            interval = max(interval, hinted_interval(feed))
+            interval = min(opts["max_interval"], max(opts["min_interval"], interval))
+            s["interval"] = interval
+            s["errors"] = 0
+            s["last_ok"] = now
+            s["next_due"] = now + self._jittered(interval)
+
+    def snapshot(self):
+        with self._lock:
+            return {url: dict(self._state[url]) for url in self.urls}
@@ -1,29 +1,38 @@
 import os
+import threading
+import time
+from datetime import datetime
 from typing import Annotated
 from typing_extensions import TypedDict
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
+from src.agent.checkpoint import BoundedSqliteSaver
+from src.agent.clients import get_llm
+from src.agent.context import format_summary, is_summary_message
+from src.agent.replycache import ReplyCache, REPLY_CACHE_IDLE_MINUTES
+from src.utils.metrics import REPLY_CACHE_LOOKUPS
+from src.utils.startup import startup
 
 # --- DeepSeek 配置 ---
 # 建议将 API KEY 放入环境变量或 .env 文件中
+# DeepSeek 模型 (兼容 OpenAI 接口) 在首次使用时创建，与摘要共用进程级连接池。
+# 导入本模块不会因为缺少 API KEY 而失败；测试可直接给 llm 赋值替换模型
+llm = None
+graph = None
+_init_lock = threading.Lock()
 
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
 
-BASE_URL = "https://api.deepseek.com"
-
-# 初始化 DeepSeek 模型 (兼容 OpenAI 接口)
-llm = ChatOpenAI(
-    model="deepseek-chat",
-    openai_api_key=DEEPSEEK_API_KEY,
-    openai_api_base=BASE_URL,
-    temperature=0.7
-)
+def get_chat_llm():
+    global llm
+    if llm is None:
+        with _init_lock:
+            if llm is None:
+                with startup.step("init chat llm"):
+                    llm = get_llm(temperature=0.7)
+    return llm
 
 # --- Prompt 配置 ---
 SYSTEM_PROMPT = """你的名字叫 Vanilla。是一个猫娘女仆。你的任务是回答 unreal engine 和 unity 相关的问题。
@@ -34,12 +43,57 @@ SYSTEM_PROMPT = """你的名字叫 Vanilla。是一个猫娘女仆。你的任
 class State(TypedDict):
     messages: Annotated[list, add_messages]
 
+# 常见问题的回复缓存 (TTL + LRU + single-flight)。
+# 只有调用方在 config 里设置 configurable.reply_cache=True 时才使用 (被 @、没有附带聊天记录、
+# 且会话已闲置，见 thread_is_idle)。此时按独立问题回答，不带会话上下文，缓存的回复才能跨群复用
+reply_cache = ReplyCache()
+
+
+def thread_is_idle(config, idle_seconds: float = REPLY_CACHE_IDLE_MINUTES * 60) -> bool:
+    """会话还没有对话，或最后一轮对话早于 idle_seconds 秒前"""
+    snapshot = get_graph().get_state(config)
+    if not snapshot.values.get("messages"):
+        return True
+    if not snapshot.created_at:
+        return False
+    last_turn = datetime.fromisoformat(snapshot.created_at).timestamp()
+    return time.time() - last_turn >= idle_seconds
+
 # --- 定义节点 ---
-def chatbot(state: State):
-    # 在调用 LLM 前添加 System Prompt
-    messages = [SystemMessage(content=SYSTEM_PROMPT)] + state["messages"]
-    response = llm.invoke(messages)
-    return {"messages": [response]}
+def chatbot(state: State, config: RunnableConfig):
+    configurable = (config or {}).get("configurable", {})
+    # 旧版本存进会话的摘要消息不再发给模型，顺带从状态里删掉
+    stale = [m for m in state["messages"] if is_summary_message(m)]
+    history = [m for m in state["messages"] if not is_summary_message(m)]
+    cleanup = [RemoveMessage(id=m.id) for m in stale if m.id]
+    # 在调用 LLM 前添加 System Prompt；随机插话时的滚动摘要经 config 传入，不写进会话状态
+    messages = [SystemMessage(content=SYSTEM_PROMPT)]
+    if configurable.get("context_summary"):
+        messages.append(SystemMessage(content=format_summary(configurable["context_summary"])))
+    messages += history
+    last = history[-1] if history else None
+    use_cache = configurable.get("reply_cache") and isinstance(last, HumanMessage) and isinstance(last.content, str)
+    if use_cache and reply_cache.key_for(last.content) is None:
+        # 太短的问题往往依赖上下文，照常带上会话
+        REPLY_CACHE_LOOKUPS.labels("bypass").inc()
+        use_cache = False
+    if not use_cache:
+        response = get_chat_llm().invoke(messages)
+        return {"messages": cleanup + [response]}
+
+    generated = {}
+
+    def generate():
+        # 独立问题：只发 System Prompt 和当前问题，回复与会话上下文无关，可以缓存给其他群
+        standalone = [SystemMessage(content=SYSTEM_PROMPT), last]
+        generated["response"] = get_chat_llm().invoke(standalone)
+        return generated["response"].content
+
+    reply, source = reply_cache.get_or_compute(last.content, generate)
+    REPLY_CACHE_LOOKUPS.labels(source).inc()
+    # 自己调用了模型时返回原消息 (流式输出已按它的 id 发出，避免重复)；
+    # 命中缓存时也返回一条 AIMessage，checkpointer 照常记录这一轮对话
+    return {"messages": cleanup + [generated.get("response") or AIMessage(content=reply)]}
 
 # --- 构建图 ---
 graph_builder = StateGraph(State)
@@ -47,11 +101,25 @@ graph_builder.add_node("chatbot", chatbot)
 graph_builder.add_edge(START, "chatbot")
 graph_builder.add_edge("chatbot", END)
 
-# 添加记忆
-memory = MemorySaver()
 
-# 编译图
-graph = graph_builder.compile(checkpointer=memory)
+def get_graph():
+    """首次调用时打开 checkpointer 并编译图"""
+    global graph
+    if graph is None:
+        with _init_lock:
+            if graph is None:
+                with startup.step("build graph"):
+                    # 添加记忆：落盘到 SQLite，每个会话只保留最近若干轮，闲置会话按 LRU 淘汰
+                    memory = BoundedSqliteSaver(
+                        os.getenv("CHECKPOINT_DB", "cache/checkpoints.db"),
+                        max_messages=int(os.getenv("CHECKPOINT_MAX_TURNS", "20")) * 2,
+                        max_chars=int(os.getenv("CHECKPOINT_MAX_CHARS", "8000")),
+                        max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "5000")),
+                        cache_threads=int(os.getenv("CHECKPOINT_CACHE_THREADS", "256")),
+                    )
+                    # 编译图
+                    graph = graph_builder.compile(checkpointer=memory)
+    return graph
 
 # --- 测试代码 (可选) ---
 if __name__ == "__main__":
@@ -64,7 +132,7 @@ if __name__ == "__main__":
         
         # 运行图
         # stream_mode="values" 可以获取每一步的状态，这里简单处理
-        events = graph.stream({"messages": [HumanMessage(content=user_input)]})
+        events = get_graph().stream({"messages": [HumanMessage(content=user_input)]})
         for event in events:
             for value in event.values():
                 if "messages" in value:
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from src.agent.summarizer import lookup_cached_summary, fetch_page_content, summarize_page
+
+# 各阶段的并发上限：抓取边下载边提取正文 (偏 IO)，摘要受 LLM 并发限制
+FETCH_CONCURRENCY = int(os.getenv("PIPELINE_FETCH_CONCURRENCY", "8"))
+SUMMARIZE_CONCURRENCY = int(os.getenv("PIPELINE_SUMMARIZE_CONCURRENCY", "4"))
+DELIVER_CONCURRENCY = int(os.getenv("PIPELINE_DELIVER_CONCURRENCY", "2"))
+# 整轮推送 (RSS 拉取 + 流水线) 的截止时间，从 run_push_cycle 开始时计时，
+# 需小于 check_rss_and_push_async 的 300 秒超时
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "270"))
+# 拉取耗时过长、剩余时间不足时，流水线至少还有这么多秒
+MIN_PIPELINE_SECONDS = 0.01
+# 截止时仍未完成的文章是否以 "标题 + 链接" 的形式先推送出去
+DELIVER_PARTIAL = os.getenv("PIPELINE_DELIVER_PARTIAL", "1") == "1"
+
+TIMEOUT_SUMMARY = "摘要生成超时，请直接阅读原文。"
+
+
+def run_pipeline(jobs, stages, deliver, deliver_concurrency=1, deadline=None,
+                 deliver_partial=True, on_timeout=None):
+    """
+    分阶段并发处理 jobs，每个 job 完成全部阶段后立即投递，不等待其它 job。
+
+    jobs:    job 字典列表，各阶段原地修改 job
+    stages:  [(name, fn, concurrency)]，fn(job)；设置 job["done"] = True 可跳过后续阶段
+    deliver: deliver(job)，最后一个阶段
+    deadline: 秒，0 或 None 表示不限时。超时后未完成的 job 若 deliver_partial 为 True，
+              先调用 on_timeout(job) 补全再投递，否则丢弃。
+    返回统计信息。
+    """
+    stats = {"total": len(jobs), "delivered": 0, "partial": 0, "dropped": 0, "stage_seconds": {}}
+    if not jobs:
+        return stats
+
+    start = time.monotonic()
+    expire_at = start + deadline if deadline else None
+    stats_lock = threading.Lock()
+    semaphores = [(name, fn, threading.BoundedSemaphore(max(1, limit))) for name, fn, limit in stages]
+    deliver_sem = threading.BoundedSemaphore(max(1, deliver_concurrency))
+
+    def expired():
+        return expire_at is not None and time.monotonic() >= expire_at
+
+    def claim(job):
+        # 同一个 job 只投递一次：工作线程和超时兜底二者取其一
+        with stats_lock:
+            if job.get("_claimed"):
+                return False
+            job["_claimed"] = True
+            return True
+
+    def do_deliver(job, partial=False):
+        with deliver_sem:
+            try:
+                deliver(job)
+            except Exception as e:
+                print(f"Pipeline deliver failed: {e}")
+                return
+        with stats_lock:
+            stats["delivered"] += 1
+            if partial:
+                stats["partial"] += 1
+
+    def process(job):
+        for name, fn, sem in semaphores:
+            if job.get("done"):
+                break
+            with sem:
+                if expired():
+                    return
+                t0 = time.monotonic()
+                try:
+                    fn(job)
+                except Exception as e:
+                    print(f"Pipeline stage {name} failed: {e}")
+                    job["error"] = f"{name}: {e}"
+                    job["done"] = True
+                with stats_lock:
+                    stats["stage_seconds"][name] = stats["stage_seconds"].get(name, 0.0) + time.monotonic() - t0
+        if not expired() and claim(job):
+            do_deliver(job)
+
+    max_workers = min(len(jobs), sum(max(1, limit) for _, _, limit in stages) + max(1, deliver_concurrency))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+    futures = [executor.submit(process, job) for job in jobs]
+    try:
+        _, not_done = wait(futures, timeout=deadline or None)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not_done:
+        print(f"Pipeline deadline ({deadline}s) reached with {len(not_done)} jobs unfinished.")
+    for job in jobs:
+        if job.get("_claimed"):
+            continue
+        if deliver_partial and on_timeout and claim(job):
+            on_timeout(job)
+            do_deliver(job, partial=True)
+        else:
+            with stats_lock:
+                stats["dropped"] += 1
+
+    stats["seconds"] = time.monotonic() - start
+    return stats
+
+
+# --- RSS 摘要流水线的各阶段 ---
+def _stage_fetch(job):
+    url = job["entry"]["link"]
+    cached = lookup_cached_summary(url)
+    if cached is not None:
+        job["summary"] = cached
+        job["done"] = True
+        return
+    # 流式提取：拿够正文字符数就断开连接，不下载整页
+    job["content"] = fetch_page_content(url)
+    if not job["content"]:
+        job["summary"] = "无法获取页面内容，无法生成摘要。"
+        job["done"] = True
+
+def _stage_summarize(job):
+    print(f"Generating summary for: {job['entry']['title']}")
+    job["summary"] = summarize_page(job["entry"]["link"], job.pop("content"))
+
+def _on_timeout(job):
+    job["summary"] = job.get("summary") or TIMEOUT_SUMMARY
+
+def _deliver_job(deliver, job):
+    if job.get("error") and not job.get("summary"):
+        job["summary"] = "生成摘要时发生错误。"
+    deliver(job["entry"], job["summary"])
+
+def summarize_and_deliver(entries, deliver, deadline=PIPELINE_DEADLINE, deliver_partial=DELIVER_PARTIAL,
+                          cycle_started=None):
+    """
+    对 RSS 条目执行 抓取 (流式提取正文) → 摘要 → 投递 流水线。
+    deliver(entry, summary) 负责把一篇文章推送给订阅者。
+    cycle_started: 整轮开始时的 time.monotonic()，传入时 deadline 从那一刻算起 (扣掉 RSS 拉取等前序耗时)
+    """
+    if cycle_started is not None and deadline:
+        deadline = max(MIN_PIPELINE_SECONDS, deadline - (time.monotonic() - cycle_started))
+    stages = [
+        ("fetch", _stage_fetch, FETCH_CONCURRENCY),
+        ("summarize", _stage_summarize, SUMMARIZE_CONCURRENCY),
+    ]
+    jobs = [{"entry": entry} for entry in entries]
+    stats = run_pipeline(
+        jobs,
+        stages,
+        lambda job: _deliver_job(deliver, job),
+        deliver_concurrency=DELIVER_CONCURRENCY,
+        deadline=deadline,
+        deliver_partial=deliver_partial,
+        on_timeout=_on_timeout,
+    )
+    print(f"Pipeline finished: {stats}")
+    return stats
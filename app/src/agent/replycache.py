@@ -0,0 +1,101 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# 条目数上限，设为 0 关闭回复缓存
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "1024"))
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL", "3600"))
+# 太短的问题 ("为什么？"、"继续") 往往依赖上下文，不走缓存
+REPLY_CACHE_MIN_CHARS = int(os.getenv("REPLY_CACHE_MIN_CHARS", "6"))
+# 会话最后一轮对话早于这么多分钟时，被 @ 的提问视为独立问题，不带会话上下文，可以走缓存
+REPLY_CACHE_IDLE_MINUTES = float(os.getenv("REPLY_CACHE_IDLE_MINUTES", "30"))
+
+# 飞书文本消息里 @ 的占位符，例如 @_user_1
+_MENTION_RE = re.compile(r"@_user_\d+")
+_TRAILING_PUNCT = " \t\r\n?？!！。.~～,，喵"
+
+
+def normalize_question(text: str) -> str:
+    """去掉 @ 占位符、全半角与大小写差异、多余空白和结尾标点，作为缓存 key"""
+    text = unicodedata.normalize("NFKC", _MENTION_RE.sub(" ", text or "")).lower()
+    return " ".join(text.split()).strip(_TRAILING_PUNCT)
+
+
+class ReplyCache:
+    """
+    问题 → 回复 的 TTL + LRU 缓存，相同问题并发到达时只有第一个调用模型，
+    其余等待同一个结果 (single-flight)。生成失败不缓存，异常会传给所有等待者。
+    """
+
+    def __init__(self, capacity: int = REPLY_CACHE_SIZE, ttl: float = REPLY_CACHE_TTL,
+                 min_chars: int = REPLY_CACHE_MIN_CHARS):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.min_chars = min_chars
+        self._entries = OrderedDict()  # key -> (写入时间, 回复)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def key_for(self, text: str):
+        """可缓存的问题返回 key，否则返回 None"""
+        if not self.enabled:
+            return None
+        key = normalize_question(text)
+        return key if len(key) >= self.min_chars else None
+
+    def _lookup(self, key, now):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        stored_at, reply = item
+        if self.ttl and now - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def get_or_compute(self, text: str, compute):
+        """
+        返回 (reply, source)，source 为 hit / miss / shared / bypass。
+        compute() 返回要缓存的回复字符串。
+        """
+        key = self.key_for(text)
+        if key is None:
+            return compute(), "bypass"
+
+        with self._lock:
+            reply = self._lookup(key, time.time())
+            if reply is not None:
+                return reply, "hit"
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result(), "shared"
+
+        try:
+            reply = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if reply:
+                self._entries[key] = (time.time(), reply)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+        future.set_result(reply)
+        return reply, "miss"
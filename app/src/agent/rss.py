@@ -4,7 +4,11 @@ import os
 from datetime import datetime
 import time
 from email.utils import parsedate_to_datetime
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from src.agent.clients import get_http_session
+from src.utils.metrics import RSS_FEED_FETCH_SECONDS
+from src.utils.seenindex import SeenArticleIndex
 
 RSS_URLS = [
     "https://www.unrealengine.com/zh-CN/rss",
@@ -16,81 +20,150 @@ RSS_URLS = [
 
 
 STATE_FILE = "rss_state.json"
+# 跨 feed 的已见文章索引 (GUID / 规范化链接 / 标题哈希)，只保留最近 N 天
+SEEN_FILE = os.getenv("RSS_SEEN_FILE", "rss_seen.json")
+SEEN_MAX_AGE_DAYS = float(os.getenv("RSS_SEEN_MAX_AGE_DAYS", "30"))
 
-def get_rss_updates():
+# 并发抓取配置：单个 feed 的超时、整轮的截止时间、最大并发数
+FEED_TIMEOUT = float(os.getenv("RSS_FEED_TIMEOUT", "30"))
+FETCH_DEADLINE = float(os.getenv("RSS_FETCH_DEADLINE", "60"))
+MAX_WORKERS = int(os.getenv("RSS_FETCH_WORKERS", "8"))
+
+def fetch_feed(url, timeout=FEED_TIMEOUT):
+    print(f"Checking feed: {url}")
+    started = time.perf_counter()
+    result = "error"
+    try:
+        # 走共享的 keep-alive 连接池 (同一站点的多个 feed 复用连接)，带超时防止挂起
+        response = get_http_session().get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout)
+        response.raise_for_status()
+        # 带上响应头，调度器会读取 Cache-Control
+        feed = feedparser.parse(response.content, response_headers=dict(response.headers))
+        result = "ok"
+        return feed
+    finally:
+        RSS_FEED_FETCH_SECONDS.labels(url, result).observe(time.perf_counter() - started)
+
+def fetch_feeds(urls, max_workers=MAX_WORKERS, timeout=FEED_TIMEOUT, deadline=FETCH_DEADLINE):
+    """
+    并发抓取多个 feed，返回 {url: feed}。
+    失败的 feed 不出现在结果中；超过 deadline 仍未完成的 feed 直接放弃，
+    整轮耗时约等于最慢的那个 feed。
+    """
+    feeds = {}
+    if not urls:
+        return feeds
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))),
+                                  thread_name_prefix="rss-fetch")
+    futures = {executor.submit(fetch_feed, url, timeout): url for url in urls}
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            url = futures[future]
+            try:
+                feeds[url] = future.result()
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+    except FuturesTimeoutError:
+        pending = [url for f, url in futures.items() if not f.done()]
+        print(f"RSS fetch deadline ({deadline}s) reached, skipped: {pending}")
+    finally:
+        # 不等待超时的线程，它们会在 socket 超时后自行结束
+        executor.shutdown(wait=False, cancel_futures=True)
+    return feeds
+
+def _make_entry(source_title, entry):
+    return {
+        "title": f"[{source_title}] {entry.title}",
+        "link": entry.link,
+        "summary": entry.summary if 'summary' in entry else "",
+        "published": entry.published if 'published' in entry else "",
+        # 供跨 feed 去重使用
+        "guid": entry.get("id", ""),
+        "entry_title": entry.title,
+    }
+
+def collect_new_entries(url, feed, state):
+    """
+    对比 state 中该 URL 的上次更新时间，返回 (新文章列表, state 是否变化)。
+    会原地更新 state[url]。
+    """
+    if not feed.entries:
+        return [], False
+
+    # 获取该 URL 的上次更新时间，默认为 0
+    last_published = state.get(url, 0)
+    max_published = last_published
+    url_new_entries = []
+    source_title = feed.feed.title if 'title' in feed.feed else "RSS Feed"
+
+    # 如果是该 URL 首次运行
+    if last_published == 0:
+        latest_entry = feed.entries[0]
+        published_parsed = latest_entry.get("published_parsed") or latest_entry.get("updated_parsed")
+        if not published_parsed:
+            return [], False
+        state[url] = time.mktime(published_parsed)
+        # 首次运行推送最新一条，以便确认
+        return [_make_entry(source_title, latest_entry)], True
+
+    # 遍历条目
+    for entry in feed.entries:
+        published_parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+        if not published_parsed:
+            continue
+
+        published_ts = time.mktime(published_parsed)
+
+        if published_ts > last_published:
+            url_new_entries.append(_make_entry(source_title, entry))
+            if published_ts > max_published:
+                max_published = published_ts
+
+    if max_published > last_published:
+        state[url] = max_published
+        return url_new_entries, True
+    return [], False
+
+def get_rss_updates(urls=None, max_workers=MAX_WORKERS, timeout=FEED_TIMEOUT, deadline=FETCH_DEADLINE,
+                    on_feed=None):
     """
     获取 RSS 更新，返回新文章列表。
+    网络抓取并发进行；state 的合并在调用线程中按 URL 顺序串行完成。
+    多个 feed 转载的同一篇文章、或改了发布时间的旧文章，会被已见索引过滤掉，
+    保证每篇文章最多摘要一次。
+    on_feed(url, feed): 可选，每个 URL 抓取完成后回调一次，失败或超时时 feed 为 None。
     """
+    urls = RSS_URLS if urls is None else urls
     all_new_entries = []
     state = load_state()
     state_updated = False
 
-    for url in RSS_URLS:
+    feeds = fetch_feeds(urls, max_workers=max_workers, timeout=timeout, deadline=deadline)
+    for url in urls:
+        if on_feed is not None:
+            try:
+                on_feed(url, feeds.get(url))
+            except Exception as e:
+                print(f"Error in on_feed callback for {url}: {e}")
+        if url not in feeds:
+            continue
         try:
-            print(f"Checking feed: {url}")
-            # Use urllib to fetch with timeout to prevent hanging
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req, timeout=30) as response:
-                feed = feedparser.parse(response)
-            
-            if not feed.entries:
-                continue
-            
-            # 获取该 URL 的上次更新时间，默认为 0
-            last_published = state.get(url, 0)
-            max_published = last_published
-            url_new_entries = []
-
-            # 如果是该 URL 首次运行
-            if last_published == 0:
-                if feed.entries:
-                    latest_entry = feed.entries[0]
-                    published_parsed = latest_entry.get("published_parsed") or latest_entry.get("updated_parsed")
-                    if published_parsed:
-                        current_ts = time.mktime(published_parsed)
-                        state[url] = current_ts
-                        state_updated = True
-                        
-                        # 首次运行推送最新一条，以便确认
-                        source_title = feed.feed.title if 'title' in feed.feed else "RSS Feed"
-                        all_new_entries.append({
-                            "title": f"[{source_title}] {latest_entry.title}",
-                            "link": latest_entry.link,
-                            "summary": latest_entry.summary if 'summary' in latest_entry else "",
-                            "published": latest_entry.published if 'published' in latest_entry else ""
-                        })
-                continue
-
-            # 遍历条目
-            for entry in feed.entries:
-                published_parsed = entry.get("published_parsed") or entry.get("updated_parsed")
-                if not published_parsed:
-                    continue
-                
-                published_ts = time.mktime(published_parsed)
-                
-                if published_ts > last_published:
-                    source_title = feed.feed.title if 'title' in feed.feed else "RSS Feed"
-                    url_new_entries.append({
-                        "title": f"[{source_title}] {entry.title}",
-                        "link": entry.link,
-                        "summary": entry.summary if 'summary' in entry else "",
-                        "published": entry.published if 'published' in entry else ""
-                    })
-                    if published_ts > max_published:
-                        max_published = published_ts
-            
-            if max_published > last_published:
-                state[url] = max_published
-                state_updated = True
-                all_new_entries.extend(url_new_entries)
-
+            new_entries, changed = collect_new_entries(url, feeds[url], state)
         except Exception as e:
-            print(f"Error fetching {url}: {e}")
+            print(f"Error parsing {url}: {e}")
+            continue
+        if changed:
+            state_updated = True
+            all_new_entries.extend(new_entries)
 
     if state_updated:
         save_state(state)
 
+    if all_new_entries:
+        seen = SeenArticleIndex(SEEN_FILE, max_age=SEEN_MAX_AGE_DAYS * 24 * 3600)
+        all_new_entries = seen.filter_new(all_new_entries)
+        seen.save()
+
     return all_new_entries
 
 def load_state():
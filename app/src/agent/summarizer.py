@@ -1,66 +1,143 @@
 import os
-import requests
-from bs4 import BeautifulSoup
-from langchain_openai import ChatOpenAI
+import itertools
+import threading
+import time
+from contextlib import contextmanager
 from langchain_core.messages import HumanMessage, SystemMessage
+from src.utils.summarycache import SummaryCache
+from src.utils.urlnorm import canonicalize_url
+from src.utils.htmltext import extract_text_from_chunks, split_text, sniff_encoding, decode_chunks
+from src.agent.clients import DEEPSEEK_API_KEY, get_http_session
+from src.agent.clients import get_llm as get_shared_llm
+from src.utils.metrics import SUMMARIZE_SECONDS
 
-# Load env if needed, but main.py should have loaded it. 
-# However, to be safe if imported independently:
+# 网页抓取超时 (秒)
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+# 单个网页最多下载的字节数，以及摘要需要的正文字符数
+MAX_FETCH_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+MAX_CONTENT_CHARS = 4000
+FETCH_CHUNK_SIZE = 16 * 1024
 
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-BASE_URL = "https://api.deepseek.com"
+# 摘要缓存：重启后、/push 与定时任务并发时都不重复下载和调用 LLM
+summary_cache = SummaryCache(
+    os.getenv("SUMMARY_CACHE_FILE", "cache/summary_cache.db"),
+    max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(20 * 1024 * 1024))),
+)
+# 同一 URL 同时只允许一个线程在生成摘要，其余等待后直接读缓存
+_inflight_locks = {}
+_inflight_guard = threading.Lock()
 
 def get_llm():
     if not DEEPSEEK_API_KEY:
         print("Warning: DEEPSEEK_API_KEY not set.")
         return None
     
-    return ChatOpenAI(
-        model="deepseek-chat",
-        openai_api_key=DEEPSEEK_API_KEY,
-        openai_api_base=BASE_URL,
-        temperature=0.3
-    )
+    return get_shared_llm(temperature=0.3)
+
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+def _open_page(url):
+    resp = get_http_session().get(url, headers=FETCH_HEADERS, timeout=FETCH_TIMEOUT, stream=True)
+    resp.raise_for_status()
+    return resp
+
+def _iter_page_bytes(resp):
+    """按块读取响应体，累计超过 MAX_FETCH_BYTES 后截断"""
+    received = 0
+    for chunk in resp.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+        if not chunk:
+            continue
+        if received + len(chunk) > MAX_FETCH_BYTES:
+            yield chunk[:MAX_FETCH_BYTES - received]
+            return
+        received += len(chunk)
+        yield chunk
+
+def _iter_page_text(resp):
+    chunks = _iter_page_bytes(resp)
+    head = next(chunks, b"")
+    encoding = sniff_encoding(resp.headers.get("Content-Type", ""), head)
+    return decode_chunks(itertools.chain([head], chunks), encoding)
+
+def extract_text(html):
+    """从 HTML 中提取正文文本"""
+    # Limit to ~4000 chars to avoid context overflow for simple summary
+    return extract_text_from_chunks(split_text(html), MAX_CONTENT_CHARS)
 
 def fetch_page_content(url):
+    """边下载边解析，拿够 MAX_CONTENT_CHARS 个正文字符就断开连接"""
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.raise_for_status()
-        
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-            
-        # Get text
-        text = soup.get_text()
-        
-        # Break into lines and remove leading/trailing space on each
-        lines = (line.strip() for line in text.splitlines())
-        # Break multi-headlines into a line each
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        # Drop blank lines
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        # Limit to ~4000 chars to avoid context overflow for simple summary
-        return text[:4000]
+        with _open_page(url) as resp:
+            return extract_text_from_chunks(_iter_page_text(resp), MAX_CONTENT_CHARS)
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
 
+@contextmanager
+def _inflight(key):
+    """按 key 串行化，并在没有等待者时清理锁，避免字典无限增长"""
+    with _inflight_guard:
+        entry = _inflight_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _inflight_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _inflight_locks[key]
+
+def lookup_cached_summary(url):
+    """按规范化 URL 查摘要缓存，未命中返回 None"""
+    started = time.perf_counter()
+    canonical = canonicalize_url(url)
+    cached = summary_cache.get(SummaryCache.url_key(canonical))
+    if cached is not None:
+        print(f"Summary cache hit (url): {canonical}")
+        SUMMARIZE_SECONDS.labels("cache_url").observe(time.perf_counter() - started)
+    return cached
+
+def summarize_page(url, content):
+    """对已提取的正文生成摘要，先按正文哈希查缓存"""
+    started = time.perf_counter()
+    url_key = SummaryCache.url_key(canonicalize_url(url))
+    content_key = SummaryCache.content_key(content)
+    cached = summary_cache.get(content_key)
+    if cached is not None:
+        print(f"Summary cache hit (content): {url}")
+        summary_cache.put([url_key], cached)
+        SUMMARIZE_SECONDS.labels("cache_content").observe(time.perf_counter() - started)
+        return cached
+
+    if not DEEPSEEK_API_KEY:
+        return "LLM 未配置，无法生成摘要。"
+    summary = summarize_content(content)
+    SUMMARIZE_SECONDS.labels("llm" if summary is not None else "error").observe(time.perf_counter() - started)
+    if summary is not None:
+        summary_cache.put([url_key, content_key], summary)
+        return summary
+    return "生成摘要时发生错误。"
+
 def fetch_and_summarize(url):
     print(f"Summarizing URL: {url}")
-    content = fetch_page_content(url)
-    if not content:
-        return "无法获取页面内容，无法生成摘要。"
-    
+    with _inflight(canonicalize_url(url)):
+        cached = lookup_cached_summary(url)
+        if cached is not None:
+            return cached
+
+        content = fetch_page_content(url)
+        if not content:
+            return "无法获取页面内容，无法生成摘要。"
+        return summarize_page(url, content)
+
+def summarize_content(content):
+    """调用 LLM 生成摘要，失败返回 None"""
     llm = get_llm()
     if not llm:
-        return "LLM 未配置，无法生成摘要。"
+        return None
 
     prompt = f"""
 请阅读以下网页正文内容，并用中文总结成 2-3 句话。
@@ -74,4 +151,4 @@ def fetch_and_summarize(url):
         return response.content.strip()
     except Exception as e:
         print(f"Error generating summary: {e}")
-        return "生成摘要时发生错误。"
+        return None
@@ -3,14 +3,41 @@ import json
 import time
 import logging
 import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import lark_oapi as lark
 from lark_oapi.api.im.v1 import *
-from langchain_core.messages import HumanMessage, AIMessage
-from src.agent.index import graph
+from langchain_core.messages import HumanMessage
+from src.agent import index as agent
+from src.agent.context import ContextBuilder, summarize_history_with
+from src.utils.ratelimit import TokenBucket
+from src.utils.dispatcher import KeyedDispatcher
+from src.utils.metrics import DEDUPE_LOOKUP_SECONDS, GRAPH_INVOKE_SECONDS, record_lark_result
+
+# 飞书发送消息接口限频：单应用 50 次/秒，同时不超过 1000 次/分钟
+SEND_QPS = float(os.getenv("LARK_SEND_QPS", "50"))
+SEND_PER_MINUTE = float(os.getenv("LARK_SEND_PER_MINUTE", "1000"))
+SEND_WORKERS = int(os.getenv("LARK_SEND_WORKERS", "16"))
+SEND_MAX_RETRIES = int(os.getenv("LARK_SEND_MAX_RETRIES", "3"))
+# 触发频率限制时返回的错误码，可退避重试
+RATE_LIMIT_CODES = {99991400, 230020, 11232, 11233}
+
+# 入站消息处理：不同群并发，同一群内保序
+DISPATCH_WORKERS = int(os.getenv("LARK_DISPATCH_WORKERS", "8"))
+DISPATCH_MAX_PENDING = int(os.getenv("LARK_DISPATCH_MAX_PENDING", "1000"))
+DISPATCH_MAX_PER_CHAT = int(os.getenv("LARK_DISPATCH_MAX_PER_CHAT", "50"))
+
+# 流式回复：先发出首条消息，再节流编辑补全。飞书文本消息最多只能编辑 20 次
+STREAM_REPLY = os.getenv("LARK_STREAM_REPLY", "1") == "1"
+STREAM_FIRST_CHARS = int(os.getenv("LARK_STREAM_FIRST_CHARS", "10"))
+STREAM_EDIT_INTERVAL = float(os.getenv("LARK_STREAM_EDIT_INTERVAL", "1.0"))
+STREAM_MAX_EDITS = int(os.getenv("LARK_STREAM_MAX_EDITS", "18"))
+STREAM_CURSOR = " ▌"
 
 
 class LarkClient:
-    def __init__(self, app_id: str, app_secret: str, event_id_cache, log_level=lark.LogLevel.DEBUG):
+    def __init__(self, app_id: str, app_secret: str, event_id_cache, log_level=lark.LogLevel.DEBUG,
+                 domain=lark.FEISHU_DOMAIN):
         self.app_id = app_id
         self.app_secret = app_secret
         self.event_id_cache = event_id_cache
@@ -20,7 +47,7 @@ class LarkClient:
         self.client = lark.Client.builder() \
             .app_id(self.app_id) \
             .app_secret(self.app_secret) \
-            .domain(lark.FEISHU_DOMAIN) \
+            .domain(domain) \
             .timeout(3) \
             .log_level(log_level) \
             .build()
@@ -41,6 +68,24 @@ class LarkClient:
         self.is_muted = False
         self.chat_log_callback = None # Function to call for logging chats
         self.history_provider = None  # Function to retrieve chat history
+        # 按 token 预算组装历史上下文，更早的记录折叠成滚动摘要
+        self.context_builder = ContextBuilder(summarize_history_with(agent.get_chat_llm))
+
+        # 批量发送：限流 (每秒 + 每分钟两个令牌桶) + 线程池
+        self.send_limiter = TokenBucket(SEND_QPS)
+        self.send_minute_limiter = TokenBucket(SEND_PER_MINUTE / 60, capacity=SEND_PER_MINUTE)
+        # 在这里创建而不是首次发送时懒创建：并发的首次 bulk_send 会各自建一个线程池。
+        # ThreadPoolExecutor 按需启动线程，空闲时没有开销
+        self._send_executor = ThreadPoolExecutor(max_workers=SEND_WORKERS, thread_name_prefix="lark-send")
+
+        # WS 线程只负责去重和入队，耗时的处理交给 dispatcher
+        self.dispatcher = KeyedDispatcher(
+            self._process_message,
+            workers=DISPATCH_WORKERS,
+            max_pending=DISPATCH_MAX_PENDING,
+            max_per_key=DISPATCH_MAX_PER_CHAT,
+            name="lark-dispatch",
+        )
 
     @property
     def api_client(self):
@@ -56,20 +101,157 @@ class LarkClient:
     def set_history_provider(self, provider):
         self.history_provider = provider
 
+    def shutdown(self, timeout=10.0):
+        """停止接收新消息，等待已入队的消息处理完"""
+        self.dispatcher.stop(timeout)
+        self._send_executor.shutdown(wait=False)
+
     def register_command(self, command, handler, desc):
         self.command_map[command] = {"handler": handler, "desc": desc}
 
-    def send_text_message(self, receive_id, text, receive_id_type="chat_id"):
-        content = json.dumps({"text": text})
+    def send_message(self, receive_id, msg_type, content, receive_id_type="chat_id", uuid=None):
+        """uuid 相同的请求飞书在 1 小时内只会创建一条消息，重试时传同一个 uuid 可避免重复发送"""
+        body = CreateMessageRequestBody.builder() \
+            .receive_id(receive_id) \
+            .msg_type(msg_type) \
+            .content(content)
+        if uuid:
+            body = body.uuid(uuid)
         request = CreateMessageRequest.builder() \
             .receive_id_type(receive_id_type) \
-            .request_body(CreateMessageRequestBody.builder()
-                .receive_id(receive_id)
+            .request_body(body.build()) \
+            .build()
+        started = time.perf_counter()
+        resp = None
+        try:
+            resp = self.client.im.v1.message.create(request)
+            return resp
+        finally:
+            record_lark_result("create", resp, started)
+
+    def send_text_message(self, receive_id, text, receive_id_type="chat_id"):
+        return self.send_message(receive_id, "text", json.dumps({"text": text}), receive_id_type)
+
+    def update_text_message(self, message_id, text):
+        request = UpdateMessageRequest.builder() \
+            .message_id(message_id) \
+            .request_body(UpdateMessageRequestBody.builder()
                 .msg_type("text")
-                .content(content)
+                .content(json.dumps({"text": text}))
                 .build()) \
             .build()
-        return self.client.im.v1.message.create(request)
+        started = time.perf_counter()
+        resp = None
+        try:
+            resp = self.client.im.v1.message.update(request)
+            return resp
+        finally:
+            record_lark_result("update", resp, started)
+
+    def _stream_reply(self, chat_id, messages_input, config):
+        """
+        流式调用 graph：攒够 STREAM_FIRST_CHARS 个字符就先发出一条消息，
+        之后按 STREAM_EDIT_INTERVAL 节流编辑，最后一次编辑写入完整回复。
+        返回 (reply_text, resp)，resp 为首条消息的发送结果；回复太短时 resp 为 None，由调用方发送。
+        首条消息发出后生成失败时不抛异常，返回带中断标记的部分回复。
+        """
+        text = ""
+        resp = None
+        message_id = None
+        edits = 0
+        last_sent = ""
+        last_edit_at = 0.0
+        streaming = True
+        try:
+            for chunk, metadata in agent.get_graph().stream({"messages": messages_input}, config=config, stream_mode="messages"):
+                if metadata.get("langgraph_node") != "chatbot" or not isinstance(chunk.content, str):
+                    continue
+                text += chunk.content
+                now = time.monotonic()
+                if not streaming:
+                    continue
+                if message_id is None:
+                    if len(text.strip()) >= STREAM_FIRST_CHARS:
+                        first = self.send_text_message(chat_id, text + STREAM_CURSOR)
+                        if not first.success():
+                            # 首条发送失败就不再流式，等生成完后由调用方整体发送
+                            print(f"流式首条消息发送失败: {first.code}, {first.msg}")
+                            streaming = False
+                            continue
+                        resp = first
+                        message_id = resp.data.message_id
+                        last_sent, last_edit_at = text, now
+                # 保留一次编辑机会给最终结果
+                elif edits < STREAM_MAX_EDITS - 1 and now - last_edit_at >= STREAM_EDIT_INTERVAL and text != last_sent:
+                    upd = self.update_text_message(message_id, text + STREAM_CURSOR)
+                    edits += 1
+                    last_edit_at = now
+                    if upd.success():
+                        last_sent = text
+                    else:
+                        print(f"流式编辑失败: {upd.code}, {upd.msg}")
+        except Exception as e:
+            if not message_id:
+                raise
+            # 已经发出了部分回复：就地标记中断并返回已生成的内容，调用方不再另发道歉消息
+            print(f"流式回复中断: {e}")
+            text += "\n（回复中断）"
+            upd = self.update_text_message(message_id, text)
+            if not upd.success():
+                print(f"流式中断编辑失败: {upd.code}, {upd.msg}")
+            return text, resp
+
+        if message_id:
+            upd = self.update_text_message(message_id, text)
+            if not upd.success():
+                print(f"流式最终编辑失败: {upd.code}, {upd.msg}，改为重新发送")
+                resp = self.send_text_message(chat_id, text)
+        return text, resp
+
+    def _send_with_retry(self, receive_id, msg_type, content, receive_id_type):
+        """
+        限流后发送，遇到频率限制或网络异常时带抖动指数退避重试。
+        每次重试都带同一个 uuid：读超时时消息可能已经创建，重试不会再发一条
+        """
+        result = {"receive_id": receive_id, "success": False, "code": None, "msg": None,
+                  "message_id": None, "attempts": 0}
+        request_uuid = str(uuid.uuid4())
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            self.send_minute_limiter.acquire()
+            self.send_limiter.acquire()
+            result["attempts"] = attempt + 1
+            try:
+                resp = self.send_message(receive_id, msg_type, content, receive_id_type, uuid=request_uuid)
+            except Exception as e:
+                result["code"], result["msg"] = -1, str(e)
+            else:
+                result["code"], result["msg"] = resp.code, resp.msg
+                if resp.success():
+                    result["success"] = True
+                    result["message_id"] = getattr(resp.data, "message_id", None) if getattr(resp, "data", None) else None
+                    return result
+                if resp.code not in RATE_LIMIT_CODES:
+                    return result
+            if attempt < SEND_MAX_RETRIES:
+                # full jitter: [0, 0.5 * 2^attempt) 秒
+                time.sleep(random.uniform(0, 0.5 * (2 ** attempt)))
+        return result
+
+    def bulk_send(self, receive_ids, msg_type, content, receive_id_type="chat_id"):
+        """
+        并发把同一条消息发给多个会话，返回与 receive_ids 顺序一致的发送结果列表：
+        {"receive_id", "success", "code", "msg", "message_id", "attempts"}
+        """
+        if not receive_ids:
+            return []
+        futures = [
+            self._send_executor.submit(self._send_with_retry, rid, msg_type, content, receive_id_type)
+            for rid in receive_ids
+        ]
+        return [f.result() for f in futures]
+
+    def send_text_messages(self, receive_ids, text, receive_id_type="chat_id"):
+        return self.bulk_send(receive_ids, "text", json.dumps({"text": text}), receive_id_type)
 
     def _cmd_mute(self, chat_id, text):
         self.is_muted = True
@@ -101,15 +283,27 @@ class LarkClient:
             print(f"[PID:{pid}] Warning: Could not check message age: {e}")
 
         # Check for duplicates
-        if self.event_id_cache.get(event_id):
+        dedupe_started = time.perf_counter()
+        # claim 是原子的检查并写入，多 worker 共享去重表时只有一个能认领成功
+        if not self.event_id_cache.claim(event_id):
+            DEDUPE_LOOKUP_SECONDS.labels("duplicate").observe(time.perf_counter() - dedupe_started)
             print(f"[PID:{pid}] Event {event_id} already processed. Skipping.")
             return
-        self.event_id_cache.put(event_id)
+        DEDUPE_LOOKUP_SECONDS.labels("new").observe(time.perf_counter() - dedupe_started)
+
+        chat_id = data.event.message.chat_id
+        if not self.dispatcher.submit(chat_id, (data, create_time)):
+            # 撤销认领，飞书重新投递这条事件时还能被处理
+            self.event_id_cache.release(event_id)
+            print(f"[PID:{pid}] Dispatch queue full ({self.dispatcher.pending()} pending). Dropping event {event_id}.")
+
+    def _process_message(self, chat_id, item):
+        data, create_time = item
+        pid = os.getpid()
 
         # Parse content
         msg_content = json.loads(data.event.message.content)
         text = msg_content.get("text", "").strip()
-        chat_id = data.event.message.chat_id
         
         # Gather sender metadata
         sender_meta = {}
@@ -139,6 +333,7 @@ class LarkClient:
         command_key = parts[0] if parts and parts[0].startswith("/") else ""
         
         reply_text = ""
+        resp = None
         if command_key in self.command_map:
             print(f"Processing command: {command_key}")
             handler = self.command_map[command_key]["handler"]
@@ -180,40 +375,48 @@ class LarkClient:
             # Application Logic (Graph Invoke)
             try:
                 messages_input = [HumanMessage(content=text)]
+                config = {"configurable": {"thread_id": chat_id}}
+                # 被 @ 的提问不附带聊天记录；会话闲置一段时间后按独立问题回答，可以走常见问题的回复缓存
+                if not use_history and agent.reply_cache.enabled:
+                    try:
+                        config["configurable"]["reply_cache"] = agent.thread_is_idle(config)
+                    except Exception as ce:
+                        print(f"Failed to check thread idle time: {ce}")
                 
                 # If random trigger, try to fetch history
                 if use_history and self.history_provider:
                     try:
                         history_data = self.history_provider(chat_id)
                         if history_data:
-                            # Convert history dicts to LangChain messages
-                            history_messages = []
-                            for h in history_data:
-                                # Skip current message if it somehow got logged already (check by content or exclude generally)
-                                if h.get("text") == text:
-                                    continue
-                                    
-                                if h.get("direction") == "inbound":
-                                    history_messages.append(HumanMessage(content=h.get("text", "")))
-                                elif h.get("direction") == "outbound":
-                                    history_messages.append(AIMessage(content=h.get("text", "")))
+                            # checkpointer 会自动带上已有对话，组装时需去重并计入预算
+                            checkpointed = agent.get_graph().get_state(config).values.get("messages", [])
+                            history_messages, summary = self.context_builder.build(
+                                chat_id, text, history_data, checkpointed)
                             
                             # Prepend history to current message
                             messages_input = history_messages + messages_input
+                            if summary:
+                                # 摘要不进入图的输入，避免被 checkpointer 存进会话
+                                config["configurable"]["context_summary"] = summary
                             print(f"Attached {len(history_messages)} historical messages to context.")
                     except Exception as he:
                         print(f"Failed to fetch/process history: {he}")
                 
-                config = {"configurable": {"thread_id": chat_id}}
-                result = graph.invoke({"messages": messages_input}, config=config)
-                reply_text = result["messages"][-1].content
+                if STREAM_REPLY:
+                    with GRAPH_INVOKE_SECONDS.labels("stream").time():
+                        reply_text, resp = self._stream_reply(chat_id, messages_input, config)
+                else:
+                    with GRAPH_INVOKE_SECONDS.labels("invoke").time():
+                        result = agent.get_graph().invoke({"messages": messages_input}, config=config)
+                    reply_text = result["messages"][-1].content
                 print(f"DeepSeek 回复: {reply_text}")
             except Exception as e:
                 print(f"DeepSeek 调用失败: {e}")
                 reply_text = "抱歉，我遇到了一些问题，请稍后再试。"
 
-        # Send Reply
-        resp = self.send_text_message(chat_id, reply_text)
+        # Send Reply (流式回复时已经发出)
+        if resp is None:
+            resp = self.send_text_message(chat_id, reply_text)
         if not resp.success():
             print(f"回复失败: {resp.code}, {resp.msg}")
 
@@ -0,0 +1,138 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from src.utils.metrics import CHAT_LOG_WRITE_SECONDS, CHAT_LOG_ENTRIES
+from src.utils.segmentlog import SegmentedLog, day_of
+
+
+class ChatLogWriter:
+    """
+    聊天日志的后台写入线程。
+    append() 只把记录放进有界队列；后台线程每个 flush_interval 把积攒的记录
+    合并成一次文件写入 + 一次数据库事务 (group commit)。
+    文件按记录时间写入 SegmentedLog 的按天分段。
+
+    fsync_policy:
+      - "always":   每次 flush 都 fsync
+      - "interval": 距离上次 fsync 超过 fsync_interval 秒才 fsync
+      - "never":    交给操作系统
+    """
+
+    def __init__(self, log, store=None, flush_interval: float = 0.2,
+                 max_queue: int = 10000, fsync_policy: str = "interval",
+                 fsync_interval: float = 5.0, put_timeout: float = 1.0):
+        if fsync_policy not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        # 兼容直接传入路径
+        self.log = log if isinstance(log, SegmentedLog) else SegmentedLog(log)
+        self.store = store
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._day = None
+        self._flush_lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        self.dropped = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, entry: dict):
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            CHAT_LOG_ENTRIES.labels("dropped").inc()
+            print(f"Chat log queue full, dropped entry (total dropped: {self.dropped})")
+
+    def close(self, timeout: float = 10.0):
+        """停止后台线程，并把队列里剩余的记录全部落盘"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # 线程未启动或未能按时退出时，在当前线程兜底写完
+        self._flush()
+        with self._flush_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _open(self, day):
+        # 只保持当天分段的文件句柄，跨天时切换
+        if self._file is None or self._day != day:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs(self.log.log_dir, exist_ok=True)
+            self._file = open(self.log.path_for_day(day), "a", encoding="utf-8")
+            self._day = day
+        return self._file
+
+    def maintain(self):
+        """压缩冷分段、按保留期删除；与写入互斥，不会动正在写的分段"""
+        with self._flush_lock:
+            if self._file is not None and self._day != day_of(int(time.time() * 1000)):
+                # 跨天后旧分段的句柄不再需要
+                self._file.close()
+                self._file = None
+                self._day = None
+            return self.log.maintain(active_day=self._day)
+
+    def _flush(self):
+        with self._flush_lock:
+            batch = self._drain()
+            if batch:
+                with CHAT_LOG_WRITE_SECONDS.time():
+                    self._write(batch)
+                CHAT_LOG_ENTRIES.labels("written").inc(len(batch))
+
+    def _write(self, batch):
+        try:
+            by_day = {}
+            now_ms = int(time.time() * 1000)
+            for e in batch:
+                by_day.setdefault(day_of(e.get("timestamp_ms") or now_ms), []).append(e)
+            now = time.monotonic()
+            do_fsync = self.fsync_policy == "always" or (
+                self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval
+            )
+            # 按日期顺序写，最后打开的是最新一天的分段
+            for day in sorted(by_day):
+                f = self._open(day)
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in by_day[day]))
+                f.flush()
+                if do_fsync:
+                    os.fsync(f.fileno())
+            if do_fsync:
+                self._last_fsync = now
+        except Exception as e:
+            print(f"Failed to write chat log: {e}")
+        if self.store is not None:
+            try:
+                self.store.append_many(batch)
+            except Exception as e:
+                print(f"Failed to index chat log: {e}")
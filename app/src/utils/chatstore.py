@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class ChatHistoryStore:
+    """
+    基于 SQLite 的聊天记录索引，按 (chat_id, timestamp_ms) 建索引。
+    查询 "某个群最近 N 天" 只扫描命中的行，开启 WAL 后读不会阻塞写。
+    """
+
+    def __init__(self, db_file: str = "logs/chat_history.db"):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        db_dir = os.path.dirname(self.db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程共享，每个线程各持有一个
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT,
+                    timestamp_ms INTEGER NOT NULL,
+                    entry TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chat_log_chat_ts ON chat_log (chat_id, timestamp_ms)"
+            )
+            # prune() 按时间删除，不带 chat_id 用不上上面的联合索引
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_log_ts ON chat_log (timestamp_ms)")
+
+    def is_empty(self) -> bool:
+        row = self._conn().execute("SELECT 1 FROM chat_log LIMIT 1").fetchone()
+        return row is None
+
+    def append(self, entry: dict):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        rows = [
+            (e.get("chat_id"), int(e.get("timestamp_ms") or 0), json.dumps(e, ensure_ascii=False))
+            for e in entries
+        ]
+        if not rows:
+            return
+        conn = self._conn()
+        with self._write_lock:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO chat_log (chat_id, timestamp_ms, entry) VALUES (?, ?, ?)", rows
+                )
+
+    def query(self, chat_id, since_ms: int, until_ms: int = None):
+        """按时间顺序返回 chat_id 在 [since_ms, until_ms] 内的记录"""
+        sql = "SELECT entry FROM chat_log WHERE chat_id = ? AND timestamp_ms >= ?"
+        params = [chat_id, since_ms]
+        if until_ms is not None:
+            sql += " AND timestamp_ms <= ?"
+            params.append(until_ms)
+        sql += " ORDER BY timestamp_ms, id"
+        history = []
+        for (raw,) in self._conn().execute(sql, params):
+            try:
+                history.append(json.loads(raw))
+            except json.JSONDecodeError:
+                continue
+        return history
+
+    def prune(self, before_ms: int) -> int:
+        """删除早于 before_ms 的记录 (保留期之外)，返回删除条数"""
+        conn = self._conn()
+        with self._write_lock:
+            with conn:
+                cur = conn.execute("DELETE FROM chat_log WHERE timestamp_ms < ?", (before_ms,))
+        return cur.rowcount
+
+    def import_jsonl(self, path: str, batch_size: int = 5000) -> int:
+        """从旧的 jsonl 日志一次性导入，返回导入条数"""
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        batch = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    batch.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if len(batch) >= batch_size:
+                    self.append_many(batch)
+                    count += len(batch)
+                    batch = []
+        if batch:
+            self.append_many(batch)
+            count += len(batch)
+        return count
@@ -0,0 +1,18 @@
+import os
+
+import yaml
+
+# 默认读取 app/config.yaml，可用 CONFIG_FILE 覆盖
+CONFIG_FILE = os.getenv("CONFIG_FILE", os.path.join(os.path.dirname(__file__), "..", "..", "config.yaml"))
+
+
+def load_config(path: str = CONFIG_FILE) -> dict:
+    """读取 YAML 配置，文件不存在或解析失败时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except Exception as e:
+        print(f"Error loading config from {path}: {e}")
+        return {}
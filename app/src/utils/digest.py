@@ -0,0 +1,91 @@
+import json
+
+# 飞书卡片消息 content 上限约 30KB，留出余量
+DIGEST_MAX_BYTES = 28 * 1024
+# 单张卡片最多放多少篇文章
+DIGEST_MAX_ENTRIES = 20
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _escape_link_text(text: str) -> str:
+    # lark_md 的 [text](url) 中方括号会截断链接文字
+    return (text or "").replace("[", "【").replace("]", "】")
+
+
+def _entry_elements(entry, summary, summary_label):
+    content = f"**[{_escape_link_text(entry['title'])}]({entry['link']})**"
+    if summary:
+        content += f"\n{summary_label}：{summary}"
+    return [{"tag": "div", "text": {"tag": "lark_md", "content": content}}, {"tag": "hr"}]
+
+
+def _card(title, elements):
+    return {
+        "config": {"wide_screen_mode": True},
+        "header": {"title": {"tag": "plain_text", "content": title}, "template": "blue"},
+        # 去掉最后一条分隔线
+        "elements": elements[:-1] if elements and elements[-1].get("tag") == "hr" else elements,
+    }
+
+
+def _entry_size(entry, summary, summary_label) -> int:
+    return _utf8_len(json.dumps(_entry_elements(entry, summary, summary_label), ensure_ascii=False))
+
+
+def _shorten(text, overflow):
+    """按超出的字节数粗略砍掉字符 (中文 1 字 3 字节)，再加省略号；太短时返回空串"""
+    if len(text) <= 16:
+        return ""
+    return text[:max(0, len(text) - overflow // 3 - 16)] + "…"
+
+
+def _fit_entry(entry, summary, summary_label, budget):
+    """单篇文章就超出上限时，按字节截断标题和摘要 (每次砍较长的一个)，返回 (entry, summary)"""
+    while True:
+        size = _entry_size(entry, summary, summary_label)
+        title = entry.get("title") or ""
+        if size <= budget or not (title or summary):
+            return entry, summary
+        if _utf8_len(title) > _utf8_len(summary or ""):
+            entry = {**entry, "title": _shorten(title, size - budget)}
+        else:
+            summary = _shorten(summary, size - budget)
+
+
+def build_digest_cards(items, title, summary_label="摘要", max_bytes=DIGEST_MAX_BYTES,
+                       max_entries=DIGEST_MAX_ENTRIES):
+    """
+    把一轮的 [(entry, summary)] 合成尽量少的卡片，每张卡片序列化后不超过 max_bytes。
+    返回可直接作为 interactive 消息 content 的 JSON 字符串列表。
+    """
+    base = _utf8_len(json.dumps(_card(title + " (99/99)", []), ensure_ascii=False))
+    budget = max(1024, max_bytes - base)
+
+    pages = []
+    elements = []
+    used = 0
+    count = 0
+    for entry, summary in items:
+        entry_elements = _entry_elements(entry, summary, summary_label)
+        size = _utf8_len(json.dumps(entry_elements, ensure_ascii=False)) + 2
+        if size > budget:
+            entry, summary = _fit_entry(entry, summary, summary_label, budget - 2)
+            entry_elements = _entry_elements(entry, summary, summary_label)
+            size = _utf8_len(json.dumps(entry_elements, ensure_ascii=False)) + 2
+        if elements and (used + size > budget or count >= max_entries):
+            pages.append(elements)
+            elements, used, count = [], 0, 0
+        elements.extend(entry_elements)
+        used += size
+        count += 1
+    if elements:
+        pages.append(elements)
+
+    cards = []
+    for i, page in enumerate(pages):
+        page_title = title if len(pages) == 1 else f"{title} ({i + 1}/{len(pages)})"
+        cards.append(json.dumps(_card(page_title, page), ensure_ascii=False))
+    return cards
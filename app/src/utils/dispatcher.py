@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class KeyedDispatcher:
+    """
+    按 key 保序的并发分发器：
+    不同 key 的任务由线程池并发处理，同一 key 的任务严格按提交顺序串行处理。
+
+    max_pending: 所有 key 排队中的任务总数上限
+    max_per_key: 单个 key 排队中的任务上限
+    超限时 submit 返回 False，由调用方决定如何处理。
+    """
+
+    def __init__(self, handler, workers: int = 8, max_pending: int = 1000, max_per_key: int = 100,
+                 name: str = "dispatcher"):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_key = max_per_key
+        self.name = name
+        self._pending = {}          # key -> deque，key 存在表示已在 _ready 中或正在被处理
+        self._pending_count = 0
+        self._ready = queue.Queue()  # 有待处理任务的 key
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, key, item) -> bool:
+        if not self._threads and not self._stopping:
+            self.start()
+        with self._lock:
+            if self._stopping or self._pending_count >= self.max_pending:
+                return False
+            items = self._pending.get(key)
+            if items is None:
+                self._pending[key] = deque([item])
+                self._ready.put(key)
+            else:
+                if len(items) >= self.max_per_key:
+                    return False
+                items.append(item)
+            self._pending_count += 1
+            return True
+
+    def pending(self) -> int:
+        return self._pending_count
+
+    def stop(self, timeout: float = 10.0):
+        """停止接收新任务，已排队的任务处理完后工作线程退出"""
+        with self._lock:
+            self._stopping = True
+            threads, self._threads = self._threads, []
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0, deadline - time.monotonic()))
+
+    def _worker(self):
+        while True:
+            try:
+                key = self._ready.get(timeout=0.5)
+            except queue.Empty:
+                with self._lock:
+                    if self._stopping and not self._pending:
+                        return
+                continue
+            with self._lock:
+                item = self._pending[key].popleft()
+                self._pending_count -= 1
+            try:
+                self.handler(key, item)
+            except Exception as e:
+                print(f"[{self.name}] handler failed for {key}: {e}")
+            with self._lock:
+                if self._pending[key]:
+                    # 每次只处理一条，然后重新排队，避免一个活跃群占满工作线程
+                    self._ready.put(key)
+                else:
+                    del self._pending[key]
@@ -0,0 +1,168 @@
+import codecs
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:  # lxml 可选，没有时退回标准库解析器
+    etree = None
+
+# 整个子树都跳过的标签：与原 BeautifulSoup 版本相同 (脚本、样式、导航、页眉页脚)，
+# 另加 noscript/template/svg 这类不含正文的标签。不能跳过 form：不少站点把整个正文包在 form 里
+SKIP_TAGS = {"script", "style", "nav", "footer", "header", "noscript", "template", "svg"}
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-]+)""", re.I)
+
+
+def normalize_text(text: str) -> str:
+    # Break into lines and remove leading/trailing space on each
+    lines = (line.strip() for line in text.splitlines())
+    # Break multi-headlines into a line each
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    # Drop blank lines
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+class _TextCollector:
+    """解析器回调的公共部分：跳过样板子树，收集正文，够数后标记 done"""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.pieces = []
+        self.raw_len = 0
+        self.skip_stack = []
+        self.done = False
+        self._next_check = max_chars
+
+    def on_start(self, tag):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self.skip_stack.append(tag)
+
+    def on_end(self, tag):
+        tag = tag.lower()
+        if self.skip_stack and self.skip_stack[-1] == tag:
+            self.skip_stack.pop()
+
+    def on_data(self, data):
+        if self.done or self.skip_stack or not data:
+            return
+        self.pieces.append(data)
+        self.raw_len += len(data)
+        # 原始长度达到阈值时才做一次归一化检查，避免每段文本都重算
+        if self.raw_len >= self._next_check:
+            if len(normalize_text("".join(self.pieces))) >= self.max_chars:
+                self.done = True
+            else:
+                self._next_check = self.raw_len + self.max_chars // 4
+
+    def text(self) -> str:
+        return normalize_text("".join(self.pieces))[:self.max_chars]
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.on_start(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        self.collector.on_end(tag)
+
+    def handle_data(self, data):
+        self.collector.on_data(data)
+
+
+class _LxmlTarget:
+    def __init__(self, collector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.on_start(tag)
+
+    def end(self, tag):
+        self.collector.on_end(tag)
+
+    def data(self, data):
+        self.collector.on_data(data)
+
+    def close(self):
+        return None
+
+
+class TextExtractor:
+    """
+    增量式 HTML 正文提取：feed() 逐块喂入文本，done 为 True 后即可停止喂入。
+    有 lxml 时用 lxml (C 实现)，否则用标准库 html.parser。
+    """
+
+    def __init__(self, max_chars: int = 4000):
+        self.collector = _TextCollector(max_chars)
+        if etree is not None:
+            self._parser = etree.HTMLParser(target=_LxmlTarget(self.collector), recover=True)
+        else:
+            self._parser = _StdlibParser(self.collector)
+
+    @property
+    def done(self) -> bool:
+        return self.collector.done
+
+    def feed(self, chunk: str):
+        if not self.collector.done and chunk:
+            self._parser.feed(chunk)
+
+    def close(self) -> str:
+        try:
+            self._parser.close()
+        except Exception:
+            # 提前停止时文档不完整，lxml 可能报错，已收集的内容仍然有效
+            pass
+        return self.collector.text()
+
+
+def extract_text_from_chunks(chunks, max_chars: int = 4000) -> str:
+    """从文本块迭代器中提取正文，拿够 max_chars 个字符就停止读取"""
+    extractor = TextExtractor(max_chars)
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.done:
+            break
+    return extractor.close()
+
+
+def split_text(text: str, size: int = 16 * 1024):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def sniff_encoding(content_type: str, head: bytes, default: str = "utf-8") -> str:
+    """优先取 Content-Type 中的 charset，其次是页面 <meta charset>，最后用默认值"""
+    if content_type:
+        for part in content_type.split(";"):
+            key, _, value = part.strip().partition("=")
+            if key.lower() == "charset" and value:
+                return value.strip("\"' ")
+    match = _META_CHARSET_RE.search(head[:4096])
+    if match:
+        return match.group(1).decode("ascii", "ignore")
+    return default
+
+
+def decode_chunks(byte_chunks, encoding: str):
+    """增量解码字节块，编码未知时回退到 utf-8"""
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class JobRun:
+    """一次后台运行：done 事件、结果/异常，以及在运行期间触发过它的请求方"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.requesters = []
+        self.done = threading.Event()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done.wait(timeout)
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class SingleFlightRunner:
+    """
+    同一时间最多只有一个后台任务在跑。
+    空闲时 submit 启动新的运行；已有运行时直接并入它 (新的 fn 被忽略)，
+    请求方记录在 run.requesters 中，运行结束后由 on_done(run) 统一通知。
+    """
+
+    def __init__(self, name: str, on_done=None):
+        self.name = name
+        self.on_done = on_done
+        self._lock = threading.Lock()
+        self._current = None
+
+    def current(self):
+        with self._lock:
+            return self._current
+
+    def submit(self, fn, requester=None):
+        """返回 (run, started)。started 为 False 表示并入了正在进行的运行"""
+        with self._lock:
+            run = self._current
+            started = run is None
+            if started:
+                run = self._current = JobRun(self.name)
+            if requester is not None and requester not in run.requesters:
+                run.requesters.append(requester)
+        if started:
+            thread = threading.Thread(target=self._run, args=(run, fn), name=f"{self.name}-run", daemon=True)
+            thread.start()
+        return run, started
+
+    def _run(self, run, fn):
+        try:
+            run.result = fn()
+        except Exception as e:
+            run.error = e
+            print(f"Background job {self.name} failed: {e}")
+        finally:
+            # 先清空 current，on_done 期间到来的新请求会开始新的一轮
+            with self._lock:
+                self._current = None
+                run.finished_at = time.time()
+            run.done.set()
+        if self.on_done is not None:
+            try:
+                self.on_done(run)
+            except Exception as e:
+                print(f"Background job {self.name} on_done failed: {e}")
@@ -1,51 +1,163 @@
 import json
 import os
+import threading
+import time
 from collections import OrderedDict
 
+from src.utils.fileio import atomic_write_json
+
 class LRUCache:
-    def __init__(self, capacity: int, useCache: bool = True, cache_file: str = "cache/lru_cache.json"):
-        self.cache = OrderedDict()
+    """
+    带持久化的 LRU 去重缓存。
+    put 只往 journal 追加一行 (O(1))，journal 超过阈值时才把全量快照写回
+    cache_file 并清空 journal (compaction)。
+
+    ttl: 可选，单位秒。开启后条目按写入时间过期，get 不再刷新位置，
+         过期条目在 put 时从队头顺带清理。
+    """
+
+    def __init__(self, capacity: int, useCache: bool = True, cache_file: str = "cache/lru_cache.json",
+                 ttl: float = None, compact_threshold: int = None):
+        self.cache = OrderedDict()  # key -> 写入时间戳
         self.capacity = capacity
         self.cache_file = cache_file
+        self.journal_file = os.path.splitext(cache_file)[0] + ".journal"
         self.useCache = useCache
+        self.ttl = ttl
+        # journal 行数超过阈值后做一次 compaction，摊还下来每次 put 仍是 O(1)
+        self.compact_threshold = compact_threshold or max(capacity, 1000)
+        self._journal = None
+        self._journal_lines = 0
+        self._lock = threading.RLock()
         if self.useCache:
             self._load_from_file()
 
+    def _expired(self, ts: float, now: float) -> bool:
+        return self.ttl is not None and now - ts > self.ttl
+
+    def _insert(self, key, ts):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        self.cache[key] = ts
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
     def _load_from_file(self):
+        now = time.time()
         if os.path.exists(self.cache_file):
             try:
                 with open(self.cache_file, "r", encoding="utf-8") as f:
-                    keys = json.load(f)
-                    for key in keys:
-                        self.cache[key] = True
-                        # 保持容量限制
-                        if len(self.cache) > self.capacity:
-                            self.cache.popitem(last=False)
+                    items = json.load(f)
+                    for item in items:
+                        # 兼容旧格式：纯 key 列表
+                        if isinstance(item, list):
+                            key, ts = item
+                        else:
+                            key, ts = item, now
+                        self._insert(key, ts)
             except Exception as e:
                 print(f"Error loading cache from {self.cache_file}: {e}")
+        if os.path.exists(self.journal_file):
+            try:
+                with open(self.journal_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            key, ts = json.loads(line)
+                        except (ValueError, TypeError):
+                            # 崩溃时最后一行可能只写了一半
+                            continue
+                        # ts 为 null 的行是 release 留下的删除记录
+                        if ts is None:
+                            self.cache.pop(key, None)
+                        else:
+                            self._insert(key, ts)
+                        self._journal_lines += 1
+            except Exception as e:
+                print(f"Error replaying journal {self.journal_file}: {e}")
+        if self.ttl is not None:
+            for key in [k for k, ts in self.cache.items() if self._expired(ts, now)]:
+                del self.cache[key]
+
+    def _append_journal(self, key, ts):
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_file) or ".", exist_ok=True)
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+        self._journal.write(json.dumps([key, ts]) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+
+    def compact(self):
+        """把全量快照原子写入 cache_file，并清空 journal"""
+        with self._lock:
+            try:
+                atomic_write_json(self.cache_file, [[k, ts] for k, ts in self.cache.items()])
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                open(self.journal_file, "w").close()
+                self._journal_lines = 0
+                print("Cache compacted to ", self.cache_file, ' at ', os.path.getmtime(self.cache_file))
+            except Exception as e:
+                print(f"Error syncing cache to {self.cache_file}: {e}")
 
     def sync(self):
-        """将当前 cache 写入文件"""
-        try:
-            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                # 保存为列表以保持顺序
-                json.dump(list(self.cache.keys()), f)
-                print("Cache synced to ", self.cache_file, ' at ', os.path.getmtime(self.cache_file))
-        except Exception as e:
-            print(f"Error syncing cache to {self.cache_file}: {e}")
+        """定时调用：把 journal 刷到磁盘。compaction 只在 journal 超过阈值时发生"""
+        if not self.useCache:
+            return
+        with self._lock:
+            if self._journal is not None:
+                try:
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+                except Exception as e:
+                    print(f"Error syncing journal {self.journal_file}: {e}")
 
     def get(self, key: str) -> bool:
-        if key not in self.cache:
-            return False
-        self.cache.move_to_end(key)
-        return True
+        with self._lock:
+            ts = self.cache.get(key)
+            if ts is None:
+                return False
+            if self._expired(ts, time.time()):
+                del self.cache[key]
+                return False
+            if self.ttl is None:
+                self.cache.move_to_end(key)
+            return True
+
+    def claim(self, key: str) -> bool:
+        """检查并写入：key 不存在 (或已过期) 时写入并返回 True，否则返回 False"""
+        with self._lock:
+            if self.get(key):
+                return False
+            self.put(key)
+            return True
+
+    def release(self, key: str) -> None:
+        """撤销 claim：认领后没能处理的事件，重新投递时可以再次认领"""
+        with self._lock:
+            if self.cache.pop(key, None) is None or not self.useCache:
+                return
+            try:
+                self._append_journal(key, None)
+            except Exception as e:
+                print(f"Error appending to {self.journal_file}: {e}")
 
     def put(self, key: str) -> None:
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        self.cache[key] = True
-        if len(self.cache) > self.capacity:
-            self.cache.popitem(last=False)
-        # 每次写入都同步，保证数据不丢失
-        self.sync()
+        with self._lock:
+            now = time.time()
+            self._insert(key, now)
+            # TTL 模式下队头是最早写入的，顺带清理过期条目
+            if self.ttl is not None:
+                while self.cache:
+                    _, oldest_ts = next(iter(self.cache.items()))
+                    if not self._expired(oldest_ts, now):
+                        break
+                    self.cache.popitem(last=False)
+            if not self.useCache:
+                return
+            try:
+                self._append_journal(key, now)
+            except Exception as e:
+                print(f"Error appending to {self.journal_file}: {e}")
+            if self._journal_lines >= self.compact_threshold:
+                self.compact()
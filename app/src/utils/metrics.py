@@ -0,0 +1,90 @@
+import functools
+import inspect
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# --- 入站消息 ---
+DEDUPE_LOOKUP_SECONDS = Histogram(
+    "vanilla_dedupe_lookup_seconds", "Event dedupe check-and-insert latency", ["result"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+CHAT_LOG_WRITE_SECONDS = Histogram(
+    "vanilla_chat_log_write_seconds", "Chat log batch write latency (file + index)",
+)
+CHAT_LOG_ENTRIES = Counter("vanilla_chat_log_entries_total", "Chat log entries written or dropped", ["status"])
+HISTORY_READ_SECONDS = Histogram("vanilla_history_read_seconds", "Chat history read latency")
+GRAPH_INVOKE_SECONDS = Histogram(
+    "vanilla_graph_invoke_seconds", "LangGraph chatbot latency", ["mode"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+REPLY_CACHE_LOOKUPS = Counter("vanilla_reply_cache_lookups_total", "Mention reply cache lookups", ["result"])
+
+# --- 飞书发送 ---
+LARK_SEND_SECONDS = Histogram("vanilla_lark_send_seconds", "Lark message API latency", ["op"])
+LARK_SEND_RESULTS = Counter("vanilla_lark_send_total", "Lark message API results by code", ["op", "code"])
+
+# --- 出站 HTTP 连接复用 (client: http 为网页/RSS 抓取，llm 为 DeepSeek)，复用率 = 1 - connections / requests ---
+OUTBOUND_REQUESTS = Counter("vanilla_outbound_requests_total", "Outbound HTTP requests", ["client"])
+OUTBOUND_CONNECTIONS = Counter("vanilla_outbound_connections_total", "New outbound TCP connections", ["client"])
+
+# --- RSS ---
+RSS_FEED_FETCH_SECONDS = Histogram(
+    "vanilla_rss_feed_fetch_seconds", "Per-feed RSS fetch time", ["feed", "result"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+# key: url / content。一次完整的未命中 = URL 和正文都没命中，即 key="content",result="miss"
+SUMMARY_CACHE_LOOKUPS = Counter("vanilla_summary_cache_lookups_total", "Summary cache lookups", ["key", "result"])
+SUMMARY_CACHE_BYTES = Gauge("vanilla_summary_cache_bytes", "Total size of cached summaries")
+SUMMARIZE_SECONDS = Histogram(
+    "vanilla_summarize_seconds", "Article summarize time by outcome", ["result"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+
+# --- 定时任务 ---
+SCHEDULER_JOB_SECONDS = Gauge("vanilla_scheduler_job_last_duration_seconds", "Duration of the last run", ["job"])
+SCHEDULER_JOB_RUNNING = Gauge("vanilla_scheduler_job_running", "Whether the job is currently running", ["job"])
+SCHEDULER_JOB_OVERRUNS = Counter(
+    "vanilla_scheduler_job_overruns_total",
+    "Runs that took longer than the schedule interval, or were skipped/missed because of that",
+    ["job", "reason"],
+)
+
+
+def record_lark_result(op, resp, started):
+    LARK_SEND_SECONDS.labels(op).observe(time.perf_counter() - started)
+    LARK_SEND_RESULTS.labels(op, str(getattr(resp, "code", "exception"))).inc()
+
+
+def timed_job(name, interval_seconds=None):
+    """记录定时任务 (同步或异步) 的耗时，超过调度间隔时计一次 overrun"""
+    def finish(started):
+        duration = time.perf_counter() - started
+        SCHEDULER_JOB_SECONDS.labels(name).set(duration)
+        SCHEDULER_JOB_RUNNING.labels(name).set(0)
+        if interval_seconds and duration > interval_seconds:
+            SCHEDULER_JOB_OVERRUNS.labels(name, "duration").inc()
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                SCHEDULER_JOB_RUNNING.labels(name).set(1)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    finish(started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            SCHEDULER_JOB_RUNNING.labels(name).set(1)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finish(started)
+        return wrapper
+    return decorator
+
@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# 单次采样窗口上限 (秒) 和最小采样间隔，防止误操作长时间占用 CPU
+MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+MIN_INTERVAL = 0.001
+
+# 栈顶是这些函数时，线程只是在等待 (锁、队列、select)，默认不计入。
+# 空闲的线程池工作线程阻塞在 C 实现的队列上，栈顶 Python 帧是 _worker
+IDLE_FUNCTIONS = {"wait", "select", "poll", "accept", "_wait_for_tstate_lock", "_worker"}
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame, thread_name) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    labels.reverse()
+    return ";".join(labels)
+
+
+def sample_stacks(seconds: float = 10.0, interval: float = 0.01, include_idle: bool = False):
+    """
+    在调用线程里用 sys._current_frames() 周期性采样所有线程的调用栈
+    (包括 WebSocket 线程、asyncio.to_thread 的工作线程和各个线程池)。
+    不安装任何 trace/profile 钩子，窗口结束后不留任何开销。
+    返回 (Counter{折叠栈: 次数}, 采样轮数)，同一时间只允许一个采样窗口。
+    """
+    seconds = max(0.0, min(seconds, MAX_SECONDS))
+    interval = max(interval, MIN_INTERVAL)
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("another profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        rounds = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+            rounds += 1
+            time.sleep(interval)
+        return stacks, rounds
+    finally:
+        _busy.release()
+
+
+def format_collapsed(stacks) -> str:
+    """flamegraph.pl / speedscope 可直接读取的折叠栈格式：每行 "a;b;c 次数" """
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
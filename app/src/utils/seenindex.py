@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from src.utils.fileio import atomic_write_json
+from src.utils.urlnorm import canonicalize_url
+
+# 太短的标题 (例如 "Weekly Update") 容易在不同来源间撞车，不参与标题去重
+MIN_TITLE_CHARS = 12
+
+_TITLE_STRIP_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def title_fingerprint(title: str) -> str:
+    """忽略大小写、空白和标点后的标题哈希；标题过短时返回空串"""
+    normalized = _TITLE_STRIP_RE.sub("", (title or "").lower())
+    if len(normalized) < MIN_TITLE_CHARS:
+        return ""
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def article_keys(entry: dict):
+    """文章的去重 key：GUID、规范化链接、标题哈希，任一命中即视为重复"""
+    keys = []
+    guid = (entry.get("guid") or "").strip()
+    if guid:
+        keys.append("guid:" + guid)
+    link = canonicalize_url(entry.get("link") or "")
+    if link:
+        keys.append("link:" + link)
+    fingerprint = title_fingerprint(entry.get("entry_title") or entry.get("title"))
+    if fingerprint:
+        keys.append("title:" + fingerprint)
+    return keys
+
+
+class SeenArticleIndex:
+    """
+    跨 feed 的已见文章索引，持久化到 JSON ({key: 首次见到的时间戳})。
+    超过 max_age 秒的记录在加载和保存时清理，文件大小随时间窗口有界。
+    """
+
+    def __init__(self, path: str = "rss_seen.json", max_age: float = 30 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _prune(self, now: float):
+        cutoff = now - self.max_age
+        expired = [k for k, ts in self._seen.items() if ts < cutoff]
+        for key in expired:
+            del self._seen[key]
+        return len(expired)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._seen = json.load(f)
+        except Exception as e:
+            print(f"Error loading seen index from {self.path}: {e}")
+            self._seen = {}
+        self._prune(time.time())
+
+    def save(self):
+        with self._lock:
+            self._prune(time.time())
+            try:
+                atomic_write_json(self.path, self._seen)
+            except Exception as e:
+                print(f"Error saving seen index to {self.path}: {e}")
+
+    def __len__(self):
+        return len(self._seen)
+
+    def filter_new(self, entries):
+        """
+        返回没见过的文章并记录它们的 key (同一批内部也会去重)。
+        调用方负责在合适的时候 save()。
+        """
+        now = time.time()
+        fresh = []
+        with self._lock:
+            for entry in entries:
+                keys = article_keys(entry)
+                if not keys:
+                    fresh.append(entry)
+                    continue
+                if any(k in self._seen for k in keys):
+                    # 已见过的文章也补记它的其他 key，例如另一个来源的 GUID
+                    for key in keys:
+                        self._seen.setdefault(key, now)
+                    print(f"Skipping duplicate article: {entry.get('title')}")
+                    continue
+                for key in keys:
+                    self._seen[key] = now
+                fresh.append(entry)
+        return fresh
@@ -0,0 +1,144 @@
+import calendar
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+
+DAY_MS = 24 * 3600 * 1000
+
+
+def day_of(timestamp_ms: int) -> str:
+    """UTC 日期，作为分段名"""
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp_ms / 1000))
+
+
+def day_start_ms(day: str) -> int:
+    return calendar.timegm(time.strptime(day, "%Y-%m-%d")) * 1000
+
+
+class SegmentedLog:
+    """
+    按天分段的 jsonl 日志：base_path 为 logs/chat_history.jsonl 时，
+    分段文件为 logs/chat_history.2024-06-01.jsonl，冷分段压缩为 .jsonl.gz。
+
+    compress_after_days: 早于 N 天前 (UTC) 的分段做 gzip 压缩
+    retention_days:      早于 N 天前的分段直接删除，None 表示永久保留
+    读取时只打开与查询时间窗重叠的分段。
+    """
+
+    def __init__(self, base_path: str = "logs/chat_history.jsonl", compress_after_days: int = 2,
+                 retention_days: int = None):
+        self.base_path = base_path
+        self.log_dir = os.path.dirname(base_path) or "."
+        name = os.path.basename(base_path)
+        self.prefix, self.suffix = os.path.splitext(name)
+        self.suffix = self.suffix or ".jsonl"
+        self.compress_after_days = compress_after_days
+        self.retention_days = retention_days
+        self._segment_re = re.compile(
+            re.escape(self.prefix) + r"\.(\d{4}-\d{2}-\d{2})" + re.escape(self.suffix) + r"(\.gz)?$"
+        )
+
+    def path_for_day(self, day: str) -> str:
+        return os.path.join(self.log_dir, f"{self.prefix}.{day}{self.suffix}")
+
+    def segments(self):
+        """[(day, path, compressed)]，按日期升序；同一天可能同时有压缩和未压缩两个文件"""
+        if not os.path.isdir(self.log_dir):
+            return []
+        found = []
+        for name in os.listdir(self.log_dir):
+            match = self._segment_re.match(name)
+            if match:
+                found.append((match.group(1), os.path.join(self.log_dir, name), bool(match.group(2))))
+        found.sort(key=lambda s: (s[0], not s[2]))
+        return found
+
+    def overlapping(self, since_ms: int, until_ms: int = None):
+        """与 [since_ms, until_ms] 重叠的分段"""
+        return [
+            s for s in self.segments()
+            if day_start_ms(s[0]) + DAY_MS > since_ms and (until_ms is None or day_start_ms(s[0]) <= until_ms)
+        ]
+
+    def read(self, since_ms: int, until_ms: int = None, chat_id=None):
+        """按时间顺序返回窗口内的记录，可按 chat_id 过滤"""
+        entries = []
+        for _, path, compressed in self.overlapping(since_ms, until_ms):
+            opener = gzip.open if compressed else open
+            try:
+                with opener(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        ts = entry.get("timestamp_ms", 0)
+                        if ts < since_ms or (until_ms is not None and ts > until_ms):
+                            continue
+                        if chat_id is not None and entry.get("chat_id") != chat_id:
+                            continue
+                        entries.append(entry)
+            except (OSError, EOFError) as e:
+                print(f"Error reading log segment {path}: {e}")
+        entries.sort(key=lambda e: e.get("timestamp_ms", 0))
+        return entries
+
+    def _compress(self, path: str):
+        # 同一天已经有 .gz 时追加一个 gzip member，gzip 读取时会自动拼接
+        gz_path = path + ".gz"
+        tmp_path = gz_path + ".tmp"
+        if os.path.exists(gz_path):
+            shutil.copyfile(gz_path, tmp_path)
+        with open(path, "rb") as src, gzip.open(tmp_path, "ab") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, gz_path)
+        os.remove(path)
+
+    def maintain(self, now_ms: int = None, active_day: str = None):
+        """压缩冷分段、删除超过保留期的分段，返回 {"compressed": n, "deleted": n}"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        today_start = day_start_ms(day_of(now_ms))
+        compress_before = today_start - (self.compress_after_days or 0) * DAY_MS
+        delete_before = today_start - self.retention_days * DAY_MS if self.retention_days else None
+        stats = {"compressed": 0, "deleted": 0}
+        for day, path, compressed in self.segments():
+            start = day_start_ms(day)
+            try:
+                if delete_before is not None and start < delete_before:
+                    os.remove(path)
+                    stats["deleted"] += 1
+                elif not compressed and day != active_day and self.compress_after_days is not None \
+                        and start < compress_before:
+                    self._compress(path)
+                    stats["compressed"] += 1
+            except OSError as e:
+                print(f"Error maintaining log segment {path}: {e}")
+        return stats
+
+    def split_legacy(self) -> int:
+        """把旧的单文件日志 (base_path) 拆进按天的分段，完成后改名为 .migrated，返回条数"""
+        if not os.path.exists(self.base_path):
+            return 0
+        count = 0
+        handles = {}
+        try:
+            with open(self.base_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    day = day_of(entry.get("timestamp_ms") or 0)
+                    out = handles.get(day)
+                    if out is None:
+                        out = handles[day] = open(self.path_for_day(day), "a", encoding="utf-8")
+                    out.write(line if line.endswith("\n") else line + "\n")
+                    count += 1
+        finally:
+            for out in handles.values():
+                out.close()
+        os.replace(self.base_path, self.base_path + ".migrated")
+        return count
@@ -0,0 +1,89 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """
+    记录冷启动各步骤 (导入、初始化) 的耗时，以及各组件是否已就绪。
+    step() 可嵌套使用，也可以在懒加载的组件首次初始化时调用。
+    expect() 登记就绪所需的组件，mark_ready_if_ok() 在它们全部 ok 时标记就绪，
+    组件稍后恢复 (例如 WebSocket 重连成功) 时可以再次调用。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = []
+        self.components = {}
+        self.expected = set()
+        self.ready_at = None
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str):
+        began = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self.steps.append({
+                    "step": name,
+                    "at": round(began - self.started, 3),
+                    "seconds": round(time.perf_counter() - began, 3),
+                    **({"error": error} if error else {}),
+                })
+
+    def set_component(self, name: str, ok: bool, detail: str = None):
+        with self._lock:
+            self.components[name] = {"ok": ok, **({"detail": detail} if detail else {})}
+
+    def expect(self, *names):
+        with self._lock:
+            self.expected.update(names)
+
+    def mark_ready_if_ok(self) -> bool:
+        """登记的组件都已上报且 ok 时标记就绪 (只标记一次)，返回是否已就绪"""
+        with self._lock:
+            if self.ready.is_set():
+                return True
+            if not self.expected or not all(self.components.get(n, {}).get("ok") for n in self.expected):
+                return False
+        self.mark_ready()
+        return True
+
+    def mark_ready(self):
+        with self._lock:
+            if self.ready.is_set():
+                return
+            self.ready_at = round(time.perf_counter() - self.started, 3)
+        self.ready.set()
+        print(self.format())
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready.is_set(),
+                "ready_after_seconds": self.ready_at,
+                "uptime_seconds": round(time.perf_counter() - self.started, 3),
+                "components": dict(self.components),
+                "steps": list(self.steps),
+            }
+
+    def format(self) -> str:
+        data = self.as_dict()
+        lines = [f"Startup report (ready after {data['ready_after_seconds']}s):"]
+        for s in data["steps"]:
+            suffix = f"  ERROR: {s['error']}" if "error" in s else ""
+            lines.append(f"  +{s['at']:>7.3f}s  {s['seconds']:>7.3f}s  {s['step']}{suffix}")
+        for name, c in data["components"].items():
+            lines.append(f"  {name}: {'ok' if c['ok'] else 'FAILED'}{' - ' + c['detail'] if 'detail' in c else ''}")
+        return "\n".join(lines)
+
+
+# 进程级单例，main 在最开始导入它，计时从这里开始
+startup = StartupReport()
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+
+from src.utils.fileio import atomic_write_json
+
+
+class SubscriptionRegistry:
+    """
+    订阅列表常驻内存 (按订阅顺序保存的集合)，查询和推送不读磁盘。
+    文件被外部修改时按 mtime 失效重载，检查最多每 check_interval 秒一次 (只 stat)。
+    写入走 atomic_write_json (写临时文件再 rename)，读者不会看到写了一半的文件。
+    """
+
+    def __init__(self, path: str = "./storage/subscriptions.json", check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._subs = {}  # chat_id -> None，dict 保留插入顺序
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._reload()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _reload(self):
+        stamp = self._file_stamp()
+        subs = []
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    subs = json.load(f)
+            except Exception as e:
+                # 读失败时保留内存里的旧数据，下次检查再试
+                print(f"Error loading subscriptions from {self.path}: {e}")
+                return
+        self._subs = dict.fromkeys(subs)
+        self._stamp = stamp
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        if self._file_stamp() != self._stamp:
+            self._reload()
+
+    def _save(self):
+        atomic_write_json(self.path, list(self._subs))
+        self._stamp = self._file_stamp()
+
+    def chats(self) -> list:
+        with self._lock:
+            self._refresh()
+            return list(self._subs)
+
+    def contains(self, chat_id) -> bool:
+        with self._lock:
+            self._refresh()
+            return chat_id in self._subs
+
+    def add(self, chat_id) -> bool:
+        """新增订阅，已订阅返回 False"""
+        with self._lock:
+            # 写之前强制检查一次，避免覆盖掉外部刚做的修改
+            self._next_check = 0.0
+            self._refresh()
+            if chat_id in self._subs:
+                return False
+            self._subs[chat_id] = None
+            try:
+                self._save()
+            except Exception:
+                del self._subs[chat_id]
+                raise
+            return True
+
+    def remove(self, chat_id) -> bool:
+        """取消订阅，未订阅返回 False"""
+        with self._lock:
+            self._next_check = 0.0
+            self._refresh()
+            if chat_id not in self._subs:
+                return False
+            del self._subs[chat_id]
+            try:
+                self._save()
+            except Exception:
+                self._subs[chat_id] = None
+                raise
+            return True
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._subs)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from src.utils.metrics import SUMMARY_CACHE_BYTES, SUMMARY_CACHE_LOOKUPS
+
+
+class SummaryCache:
+    """
+    持久化的摘要缓存，同一份摘要按两个 key 存储：
+      - url:<规范化 URL>      命中时连网页都不用下载
+      - content:<正文 sha256> 不同 URL 指向相同正文时免去 LLM 调用
+    总大小超过 max_bytes 时按最近使用时间淘汰 (LRU)。
+    """
+
+    def __init__(self, db_file: str = "cache/summary_cache.db", max_bytes: int = 20 * 1024 * 1024):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(self.db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_last_used ON summaries (last_used)")
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        self.total_bytes = row[0]
+        SUMMARY_CACHE_BYTES.set(self.total_bytes)
+
+    @staticmethod
+    def url_key(canonical_url: str) -> str:
+        return f"url:{canonical_url}"
+
+    @staticmethod
+    def content_key(content: str) -> str:
+        return "content:" + hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            # 按 key 类型分别统计命中/未命中，导出到 /metrics
+            kind = key.split(":", 1)[0]
+            if row is None:
+                SUMMARY_CACHE_LOOKUPS.labels(kind, "miss").inc()
+                return None
+            SUMMARY_CACHE_LOOKUPS.labels(kind, "hit").inc()
+            with self._conn:
+                self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, keys, summary: str):
+        size = len(summary.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                for key in keys:
+                    old = self._conn.execute("SELECT size FROM summaries WHERE key = ?", (key,)).fetchone()
+                    if old:
+                        self.total_bytes -= old[0]
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                        (key, summary, size, now),
+                    )
+                    self.total_bytes += size
+                self._evict()
+            SUMMARY_CACHE_BYTES.set(self.total_bytes)
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM summaries")
+            self.total_bytes = 0
+            SUMMARY_CACHE_BYTES.set(0)
+
+    def _evict(self):
+        # 调用方已持有锁并处于事务中
+        while self.total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM summaries ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    return
+
@@ -0,0 +1,27 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 统计/追踪类参数，对内容没有影响
+TRACKING_PARAMS = {"fbclid", "gclid", "spm", "ref", "from", "source"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    规范化 URL，用作缓存/去重的 key：
+    scheme 和 host 小写、去掉默认端口、fragment、utm_* 等追踪参数，
+    query 参数排序，去掉路径末尾的 /。
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
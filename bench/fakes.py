@@ -0,0 +1,188 @@
+"""
+Stand-ins for the bot's external dependencies, all local and deterministic:
+
+- FakeLarkServer: the subset of the Feishu Open API the bot calls
+  (tenant token, message create, message update)
+- StubChatModel: a LangChain chat model with configurable latency
+- FixtureServer: RSS feeds and article HTML with per-path latency
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端提前断开 (例如正文提取拿够字符后) 属于预期行为
+        pass
+
+
+def _serve(handler_cls):
+    server = _QuietServer(("127.0.0.1", 0), handler_cls)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeLarkServer:
+    """
+    模拟飞书开放平台：返回固定 token，记录 create/update 调用次数。
+    latency 为每次消息接口调用的固定延迟 (秒)。
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.counts = {"create": 0, "update": 0, "token": 0}
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(_JsonHandler):
+            def do_POST(self):
+                self._read_body()
+                if "/auth/v3/" in self.path:
+                    fake._count("token")
+                    self._send(200, {"code": 0, "msg": "ok", "tenant_access_token": "t-bench",
+                                     "app_access_token": "a-bench", "expire": 7200})
+                elif self.path.startswith("/open-apis/im/v1/messages"):
+                    time.sleep(fake.latency)
+                    n = fake._count("create")
+                    self._send(200, {"code": 0, "msg": "success", "data": {"message_id": f"om_{n}"}})
+                else:
+                    self._send(404, {"code": 404, "msg": "not found"})
+
+            def do_PUT(self):
+                self._read_body()
+                time.sleep(fake.latency)
+                fake._count("update")
+                self._send(200, {"code": 0, "msg": "success", "data": {}})
+
+        self.server = _serve(Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+            return self.counts[key]
+
+    def close(self):
+        self.server.shutdown()
+
+
+class StubChatModel(BaseChatModel):
+    """固定回复的聊天模型：first_token_latency 后开始输出，之后每个 token 间隔 token_latency"""
+
+    reply: str = "这是一个用于基准测试的固定回复 喵～ " * 4
+    first_token_latency: float = 0.05
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _tokens(self):
+        return [self.reply[i:i + 4] for i in range(0, len(self.reply), 4)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency + self.token_latency * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        for token in self._tokens():
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def make_feed(feed_id: int, entries: int = 10, base_ts: int = 1_700_000_000) -> str:
+    items = []
+    for i in range(entries):
+        ts = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(base_ts - i * 3600))
+        items.append(
+            f"<item><title>Feed {feed_id} article {i}</title>"
+            f"<link>http://fixtures.local/article/{feed_id}-{i}.html</link>"
+            f"<guid>feed-{feed_id}-{i}</guid>"
+            f"<description>Article {i} of feed {feed_id}</description>"
+            f"<pubDate>{ts}</pubDate></item>"
+        )
+    return (f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed {feed_id}</title>'
+            + "".join(items) + "</channel></rss>")
+
+
+def make_article(size_bytes: int, seed: int = 0) -> str:
+    """带有导航、脚本等样板内容的文章 HTML，正文为可复现的伪随机中英文段落"""
+    rng = random.Random(seed)
+    words = ["Unreal", "Unity", "渲染", "管线", "Nanite", "Lumen", "性能", "优化", "shader", "引擎", "材质", "动画"]
+    head = ("<html><head><meta charset='utf-8'><title>Fixture article</title>"
+            "<style>body{font-family:sans-serif}</style><script>var x = 1;</script></head><body>"
+            "<header><nav>" + "<a href='#'>menu</a>" * 50 + "</nav></header><article>")
+    tail = "</article><aside>related</aside><footer>footer</footer></body></html>"
+    parts = [head]
+    size = len(head) + len(tail)
+    while size < size_bytes:
+        para = "<p>" + " ".join(rng.choice(words) for _ in range(40)) + "</p>\n"
+        parts.append(para)
+        size += len(para.encode("utf-8"))
+    parts.append(tail)
+    return "".join(parts)
+
+
+class FixtureServer:
+    """
+    提供 /feed/<id>.xml 与 /article/<name>.html。
+    latencies: {path: 秒}，未列出的路径使用 default_latency。
+    """
+
+    def __init__(self, feeds=None, articles=None, latencies=None, default_latency: float = 0.0):
+        self.feeds = feeds or {}
+        self.articles = articles or {}
+        self.latencies = latencies or {}
+        self.default_latency = default_latency
+        fixture = self
+
+        class Handler(_JsonHandler):
+            def do_GET(self):
+                time.sleep(fixture.latencies.get(self.path, fixture.default_latency))
+                if self.path in fixture.feeds:
+                    self._send(200, fixture.feeds[self.path].encode("utf-8"), "application/rss+xml")
+                elif self.path in fixture.articles:
+                    self._send(200, fixture.articles[self.path].encode("utf-8"), "text/html; charset=utf-8")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+        self.server = _serve(Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
@@ -0,0 +1,361 @@
+"""
+Offline benchmarks for the bot's hot paths.
+
+Usage (from the repository root):
+    python bench/run.py                       # all benchmarks, default sizes
+    python bench/run.py --only lru history    # a subset
+    python bench/run.py --json bench_output.json
+
+Everything runs against local stand-ins (bench/fakes.py) inside a
+temporary working directory, so no credentials or network are needed.
+Random data is seeded; report medians over --repeat runs when comparing.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 应用模块在导入时读取环境变量，必须在导入之前设置
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+os.environ.setdefault("BOT_NAME", "bench-bot")
+os.environ.setdefault("LARK_STREAM_REPLY", "0")
+
+from fakes import FakeLarkServer, FixtureServer, StubChatModel, make_article, make_feed  # noqa: E402
+
+SEED = 20240601
+
+
+@contextlib.contextmanager
+def quiet():
+    """应用代码大量 print，计时期间丢弃输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def row(bench, case, ops, seconds, samples=None, **extra):
+    result = {
+        "bench": bench,
+        "case": case,
+        "ops": ops,
+        "seconds": round(seconds, 4),
+        "ops_per_sec": round(ops / seconds, 1) if seconds > 0 else None,
+    }
+    if samples:
+        result["p50_ms"] = round(percentile(samples, 50) * 1000, 3)
+        result["p99_ms"] = round(percentile(samples, 99) * 1000, 3)
+    result.update(extra)
+    return result
+
+
+# --- LRUCache ---
+def bench_lru(args):
+    from src.utils.dedupe import SqliteDedupeStore
+    from src.utils.lrucache import LRUCache
+
+    results = []
+    for capacity in args.lru_capacities:
+        for ttl in (None, 600):
+            cache = LRUCache(capacity, cache_file=f"cache/lru_{capacity}_{ttl}.json", ttl=ttl)
+            keys = [f"evt_{i}" for i in range(capacity * 2)]
+            with quiet():
+                start = time.perf_counter()
+                for key in keys:
+                    cache.put(key)
+                put_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                for key in keys[-capacity:]:
+                    cache.get(key)
+                get_seconds = time.perf_counter() - start
+            case = f"capacity={capacity} ttl={ttl}"
+            results.append(row("lru.put", case, len(keys), put_seconds))
+            results.append(row("lru.get", case, capacity, get_seconds))
+
+        store = SqliteDedupeStore(f"cache/dedupe_{capacity}.db", ttl=600, capacity=capacity)
+        keys = [f"evt_{i}" for i in range(capacity * 2)]
+        start = time.perf_counter()
+        for key in keys:
+            store.claim(key)
+        results.append(row("dedupe.sqlite_claim", f"capacity={capacity}", len(keys), time.perf_counter() - start))
+    return results
+
+
+# --- 聊天记录查询 ---
+def _legacy_scan(path, chat_id, cutoff_ms):
+    history = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("chat_id") == chat_id and entry.get("timestamp_ms", 0) >= cutoff_ms:
+                history.append(entry)
+    history.sort(key=lambda x: x.get("timestamp_ms", 0))
+    return history
+
+
+def bench_history(args):
+    from src.utils.chatstore import ChatHistoryStore
+    from src.utils.segmentlog import SegmentedLog
+
+    rng = random.Random(SEED)
+    now_ms = int(time.time() * 1000)
+    span_ms = 30 * 24 * 3600 * 1000
+    chats = [f"oc_{i}" for i in range(args.history_chats)]
+    results = []
+    for size in args.history_sizes:
+        store = ChatHistoryStore(f"logs/history_{size}.db")
+        entries = [
+            {"direction": "inbound", "chat_id": rng.choice(chats), "timestamp_ms": now_ms - rng.randrange(span_ms),
+             "text": "消息" * rng.randint(5, 40)}
+            for _ in range(size)
+        ]
+        store.append_many(entries)
+        jsonl = f"logs/history_{size}.jsonl"
+        with open(jsonl, "w", encoding="utf-8") as f:
+            for e in entries:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+        cutoff = now_ms - 24 * 3600 * 1000
+        samples = []
+        for i in range(args.history_queries):
+            start = time.perf_counter()
+            store.query(chats[i % len(chats)], cutoff)
+            samples.append(time.perf_counter() - start)
+        results.append(row("history.indexed", f"entries={size}", len(samples), sum(samples), samples))
+
+        seg_dir = f"logs/segments_{size}"
+        os.makedirs(seg_dir, exist_ok=True)
+        shutil.copyfile(jsonl, os.path.join(seg_dir, "chat_history.jsonl"))
+        segments = SegmentedLog(os.path.join(seg_dir, "chat_history.jsonl"), compress_after_days=2, retention_days=None)
+        segments.split_legacy()
+        segments.maintain()
+        samples = []
+        for i in range(min(20, args.history_queries)):
+            start = time.perf_counter()
+            segments.read(cutoff, chat_id=chats[i % len(chats)])
+            samples.append(time.perf_counter() - start)
+        results.append(row("history.segments", f"entries={size}", len(samples), sum(samples), samples))
+
+        if size <= args.history_legacy_max:
+            samples = []
+            for i in range(min(5, args.history_queries)):
+                start = time.perf_counter()
+                _legacy_scan(jsonl, chats[i % len(chats)], cutoff)
+                samples.append(time.perf_counter() - start)
+            results.append(row("history.legacy_scan", f"entries={size}", len(samples), sum(samples), samples))
+    return results
+
+
+# --- RSS 抓取 ---
+def bench_rss(args):
+    from src.agent import rss
+
+    rng = random.Random(SEED)
+    results = []
+    for n in args.rss_feeds:
+        feeds = {f"/feed/{i}.xml": make_feed(i) for i in range(n)}
+        latencies = {path: rng.uniform(0.05, 0.3) for path in feeds}
+        slowest_path = f"/feed/{n - 1}.xml"
+        latencies[slowest_path] = args.rss_slow_feed
+        server = FixtureServer(feeds=feeds, latencies=latencies)
+        urls = [server.url + path for path in feeds]
+        try:
+            samples = []
+            for _ in range(args.repeat):
+                for path in (rss.STATE_FILE, rss.SEEN_FILE):
+                    if os.path.exists(path):
+                        os.remove(path)
+                with quiet():
+                    start = time.perf_counter()
+                    rss.get_rss_updates(urls)
+                    samples.append(time.perf_counter() - start)
+            results.append(row("rss.get_rss_updates", f"feeds={n}", len(samples), sum(samples), samples,
+                               slowest_feed_s=max(latencies.values()),
+                               serial_estimate_s=round(sum(latencies.values()), 3)))
+        finally:
+            server.close()
+    return results
+
+
+# --- 正文提取与摘要 ---
+def bench_extract(args):
+    from src.agent import summarizer
+
+    articles = {f"/article/{kb}k.html": make_article(kb * 1024, seed=kb) for kb in args.article_kb}
+    server = FixtureServer(articles=articles)
+    stub = StubChatModel(first_token_latency=args.llm_latency)
+    summarizer.get_llm = lambda: stub
+    results = []
+    try:
+        for path, html in articles.items():
+            url = server.url + path
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                summarizer.extract_text(html)
+                samples.append(time.perf_counter() - start)
+            results.append(row("extract.in_memory", path, len(samples), sum(samples), samples))
+
+            samples = []
+            with quiet():
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    summarizer.fetch_page_content(url)
+                    samples.append(time.perf_counter() - start)
+            results.append(row("extract.fetch_page_content", path, len(samples), sum(samples), samples))
+
+            # cold: 每轮先清空摘要缓存；warm: 紧接着再摘要一次，命中 URL 缓存
+            cold, warm = [], []
+            with quiet():
+                for _ in range(args.repeat):
+                    summarizer.summary_cache.clear()
+                    start = time.perf_counter()
+                    summarizer.fetch_and_summarize(url)
+                    cold.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    summarizer.fetch_and_summarize(url)
+                    warm.append(time.perf_counter() - start)
+            results.append(row("summarize.cold", path, len(cold), sum(cold), cold))
+            results.append(row("summarize.warm", path, len(warm), sum(warm), warm))
+    finally:
+        server.close()
+    return results
+
+
+# --- 入站消息处理吞吐 ---
+def _make_event(i, chat_id, bot_name):
+    from lark_oapi.api.im.v1 import P2ImMessageReceiveV1
+
+    return P2ImMessageReceiveV1({
+        "schema": "2.0",
+        "header": {"event_id": f"bench_evt_{i}", "event_type": "im.message.receive_v1"},
+        "event": {
+            "sender": {"sender_id": {"open_id": f"ou_{i % 97}"}},
+            "message": {
+                "message_id": f"om_in_{i}",
+                "chat_id": chat_id,
+                "create_time": str(int(time.time() * 1000)),
+                "content": json.dumps({"text": f"问题 {i}: Nanite 怎么开启？"}),
+                "mentions": [{"name": bot_name}],
+            },
+        },
+    })
+
+
+def bench_handle_message(args):
+    import lark_oapi as lark
+    import src.agent.index as agent_index
+    from src.larkClient import LarkClient
+    from src.utils.lrucache import LRUCache
+
+    fake = FakeLarkServer(latency=args.lark_latency)
+    agent_index.llm = StubChatModel(first_token_latency=args.llm_latency)
+    client = LarkClient("bench_app", "bench_secret", LRUCache(100000, cache_file="cache/bench_lru.json", ttl=600),
+                        log_level=lark.LogLevel.ERROR, domain=fake.url)
+    results = []
+    try:
+        offset = 0
+        for chats in args.handle_chats:
+            n = args.handle_messages
+            events = [_make_event(offset + i, f"oc_bench_{chats}_{i % chats}", os.environ["BOT_NAME"])
+                      for i in range(n)]
+            offset += n
+            target = fake.counts["create"] + n
+            with quiet():
+                start = time.perf_counter()
+                for event in events:
+                    client._handle_message(event)
+                enqueue_seconds = time.perf_counter() - start
+                deadline = time.monotonic() + args.handle_timeout
+                while fake.counts["create"] < target and time.monotonic() < deadline:
+                    time.sleep(0.005)
+                total = time.perf_counter() - start
+            done = n - (target - fake.counts["create"])
+            results.append(row("handle_message", f"messages={n} chats={chats}", done, total,
+                               enqueue_ms_per_msg=round(enqueue_seconds / n * 1000, 3)))
+    finally:
+        client.shutdown(timeout=1)
+        fake.close()
+    return results
+
+
+BENCHMARKS = {
+    "lru": bench_lru,
+    "history": bench_history,
+    "rss": bench_rss,
+    "extract": bench_extract,
+    "handle": bench_handle_message,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM first-token latency (s)")
+    parser.add_argument("--lark-latency", type=float, default=0.01, help="fake Lark API latency (s)")
+    parser.add_argument("--lru-capacities", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--history-chats", type=int, default=50)
+    parser.add_argument("--history-queries", type=int, default=50)
+    parser.add_argument("--history-legacy-max", type=int, default=100000,
+                        help="largest size to also time the old full-file scan on")
+    parser.add_argument("--rss-feeds", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--rss-slow-feed", type=float, default=1.0, help="latency of the slowest feed (s)")
+    parser.add_argument("--article-kb", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--handle-messages", type=int, default=200)
+    parser.add_argument("--handle-chats", type=int, nargs="+", default=[1, 20])
+    parser.add_argument("--handle-timeout", type=float, default=120)
+    return parser.parse_args(argv)
+
+
+def print_table(results):
+    columns = ["bench", "case", "ops", "seconds", "ops_per_sec", "p50_ms", "p99_ms"]
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
+        extra = {k: v for k, v in r.items() if k not in columns}
+        if extra:
+            print("    " + ", ".join(f"{k}={v}" for k, v in extra.items()))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = args.only or list(BENCHMARKS)
+    workdir = tempfile.mkdtemp(prefix="vanilla-bench-")
+    os.chdir(workdir)
+    env = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+           "seed": SEED, "workdir": workdir}
+    print(f"# {json.dumps(env)}")
+
+    results = []
+    for name in selected:
+        print(f"# running {name} ...", file=sys.stderr)
+        results.extend(BENCHMARKS[name](args))
+    print_table(results)
+    if args.json:
+        with open(os.path.join(ROOT, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            json.dump({"env": env, "results": results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()